@@ -0,0 +1,24 @@
+"""yoes is short for "Young Oxford Encyclopedia of Science", which is a name of a book.
+The book is organized into many HEADWORDS, which are referenced much by each other.
+This package is to analyze the dependance relationship between the HEADWORDS and to find
+a proper learning sequence.
+
+Importing it has no side effects: logging is configured by `python -m yoes`
+and the Tk editor lives in yoes.gui, which is only imported to run the GUI.
+"""
+
+from __future__ import absolute_import
+
+import logging
+
+from .profile import PROFILER, Profiler
+from .graph import HeadwordGraph, HeadwordHierarchy, HeadwordIndex, LearningSequence, PrerequisiteClosure, \
+    TopologicalOrder, CycleError
+from .duplicates import NearDuplicateIndex
+from .storage import DbStorage, WriteJournal, ImportStats, TxtfileStorage, update_sequence
+
+__all__ = ['PROFILER', 'Profiler', 'HeadwordGraph', 'HeadwordHierarchy', 'HeadwordIndex', 'LearningSequence',
+    'PrerequisiteClosure', 'TopologicalOrder', 'CycleError', 'NearDuplicateIndex', 'DbStorage', 'WriteJournal',
+    'ImportStats', 'TxtfileStorage', 'update_sequence']
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -0,0 +1,267 @@
+"""Command line of yoes: `python -m yoes [gui|import|duplicates|sync|levels|sequence|optimize|snapshot|prerequisites|path|cycles|serve|loadtest]`."""
+
+from __future__ import absolute_import, print_function
+
+import sys
+import json
+import time
+import logging
+import sqlite3
+import argparse
+
+from .graph import LearningSequence
+from .storage import DbStorage, TxtfileStorage, update_levels, update_sequence
+from .profile import PROFILER
+from .snapshot import write_snapshot
+from .duplicates import NearDuplicateIndex
+
+logger = logging.getLogger(__name__)
+
+LOGGING_FORMAT =        '[%(levelname)5s] %(asctime)s %(msecs)3d <%(process)d:%(thread)d:%(threadName)10s> ' + \
+                        '{%(filename)s:%(lineno)4d%(funcName)35s} %(message)s'
+LOGGING_SHORT_FORMAT =  '[%(levelname)5s] %(asctime)s %(message)s'
+LOGGING_DATE_FORMAT =   '%Y-%m-%d %H:%M:%S'
+
+def command_gui(args):
+    from .gui import YoesApplication
+    app = YoesApplication(dbname=args.db)
+    app.mainloop()
+
+def command_import(args):
+    db = DbStorage()
+    db.db_open(args.db)
+    txtfile = TxtfileStorage(db, None if args.duplicates == 'off' else args.duplicates, args.max_distance)
+    duplicates = list()
+    for (filename, process) in ((args.headwords, txtfile.process_headwords_txtfile),
+            (args.findoutmore, txtfile.process_findoutmore_txtfile)):
+        stats = process(filename)
+        duplicates.extend(stats.duplicates)
+        print(json.dumps(dict(filename=filename, lines=stats.lines, rows=stats.rows, rejected=stats.rejected,
+            duplicates=len(stats.duplicates), merged=stats.merged, seconds=stats.seconds), sort_keys=True))
+    db.db_save()
+    db.db_close()
+    if args.report is not None:
+        with open(args.report, 'w') as f:
+            for (lineno, headword, similar) in duplicates:
+                f.write(json.dumps(dict(line=lineno, headword=headword, merged=args.duplicates == 'merge',
+                    similar=[dict(distance=distance, headword=name, id=headword_id)
+                    for (distance, name, headword_id) in similar]), sort_keys=True) + '\n')
+
+def command_duplicates(args):
+    db = DbStorage()
+    db.db_open(args.db)
+    index = NearDuplicateIndex(args.max_distance)
+    for (headword_id, headword, level) in db.query_all_headwords():
+        index.add(headword, headword_id)
+    db.db_close()
+    pairs = 0
+    for (headword, headword_id, similar) in index.find_all():
+        for (distance, name, similar_id) in similar:
+            if headword_id < similar_id:
+                pairs += 1
+                print(u'%s\t%s\t%s' % (distance, headword, name))
+    logger.info('%s pairs of near-duplicate headwords', pairs)
+    return 1 if pairs else 0
+
+def command_sync(args):
+    from .sync import TxtfileSync
+    db = DbStorage()
+    db.db_open(args.db)
+    sync = TxtfileSync(db, args.headwords, args.findoutmore)
+    if args.pull:
+        results = [sync.pull()]
+    elif args.push:
+        results = [sync.push()]
+    else:
+        results = [stats for stats in sync.sync() if stats is not None]
+    db.db_close()
+    for stats in results:
+        print(json.dumps(stats.summary(), sort_keys=True))
+
+def command_levels(args):
+    db = DbStorage()
+    db.db_open(args.db)
+    (changes, orphans, conflicts) = update_levels(db, args.dry_run)
+    db.db_close()
+    for (headword, old_level, new_level) in changes:
+        print(u'level\t%s\t%s\t%s' % (headword, old_level, new_level))
+    for headword in orphans:
+        print(u'orphan\t%s' % headword)
+    for (headword, problem, parents) in conflicts:
+        print(u'conflict\t%s\t%s\t%s' % (headword, problem, ', '.join(parents)))
+    logger.info('%s levels %s, %s orphans, %s conflicts', len(changes),
+        'to change' if args.dry_run else 'changed', len(orphans), len(conflicts))
+
+def command_sequence(args):
+    db = DbStorage()
+    db.db_open(args.db)
+    if not args.show:
+        started = time.time()
+        sequence = update_sequence(db)
+        logger.info('sequence of %s headwords computed in %.3fs', len(sequence.order), time.time() - started)
+    for (headword, rank) in db.query_sequence():
+        print(u'%s\t%s' % (rank, headword))
+    db.db_close()
+
+def command_optimize(args):
+    from .optimize import load_optimizer, SequenceOptimizer
+    db = DbStorage()
+    db.db_open(args.db)
+    weights = dict(SequenceOptimizer.WEIGHTS)
+    weights[2] = args.subclass_weight
+    optimizer = load_optimizer(db, weights)
+    started = time.time()
+    (cost, order) = optimizer.optimize(args.budget, args.workers, args.epoch, args.seed)
+    violations = list(optimizer.violations(order))
+    if args.violations is not None:
+        with open(args.violations, 'w') as f:
+            for (from_id, to_id, weight) in violations:
+                f.write(json.dumps(dict(from_headword=db.query_headword_byid(from_id)[0],
+                    to_headword=db.query_headword_byid(to_id)[0], weight=weight), sort_keys=True) + '\n')
+    if args.save:
+        db.save_sequence([(headword_id, rank) for (rank, headword_id) in enumerate(order)])
+        db.db_save()
+    print(json.dumps(dict(headwords=optimizer.n, edges=optimizer.m, self_loops=optimizer.loops, cost=cost,
+        violations=len(violations), seconds=time.time() - started, saved=args.save), sort_keys=True))
+    db.db_close()
+
+def command_snapshot(args):
+    db = DbStorage()
+    db.db_open(args.db)    # brings the schema up to date, so that META.generation exists
+    db.db_close()
+    connection = sqlite3.connect(args.db)
+    write_snapshot(connection, args.output)
+    connection.close()
+
+def command_prerequisites(args):
+    db = DbStorage()
+    db.db_open(args.db)
+    if args.dependents:
+        rows = db.query_dependents(args.headword)
+    else:
+        rows = db.query_prerequisites(args.headword)
+    for (headword,) in rows:
+        print(headword)
+    db.db_close()
+
+def command_path(args):
+    db = DbStorage()
+    db.db_open(args.db)
+    db.load_graph()
+    for path in db.query_paths(args.from_headword, args.to_headword, args.type, args.k):
+        print(u' -> '.join(path))
+    db.db_close()
+
+def command_cycles(args):
+    db = DbStorage()
+    db.db_open(args.db)
+    graph = db.load_graph()
+    type_ids = LearningSequence.SEQUENCE_TYPE_IDS if args.type is None else args.type
+    cycles = graph.find_cycles(type_ids)
+    for cycle in cycles:
+        print(u'%s\t%s' % (len(cycle), u' | '.join(cycle)))
+    logger.info('%s strongly connected components with cycles', len(cycles))
+    db.db_close()
+    return 1 if cycles else 0
+
+def command_serve(args):
+    from .service import serve
+    serve(args.db, args.host, args.port)
+
+def command_loadtest(args):
+    from .service import LoadTest
+    summary = LoadTest(args.host, args.port, args.clients, args.requests, args.writes).run()
+    print(json.dumps(summary, sort_keys=True))
+
+def main(argv):
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('--db', default='yoes.db', help='sqlite database file')
+    options.add_argument('--profile', metavar='FILE', help='profile the run and write the statistics here as JSON')
+    options.add_argument('--trace', action='store_true', help='log ENTER/LEAVE of the profiled methods')
+    options.add_argument('--log', default='yoes.log', help='log file, overwritten on every run')
+    options.add_argument('--log-format', choices=['short', 'long'], default='short',
+        help='long adds process, thread and source location to every log record')
+    parser = argparse.ArgumentParser(description='The Young Oxford Encyclopedia of Science', parents=[options])
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('gui', help='browse and edit the headwords (default)')
+    parser_import = subparsers.add_parser('import', help='load headwords.txt and findoutmore.txt into the database')
+    parser_import.add_argument('--headwords', default='headwords.txt', help='headwords text file')
+    parser_import.add_argument('--findoutmore', default='findoutmore.txt', help='findoutmore text file')
+    parser_import.add_argument('--duplicates', choices=['off', 'flag', 'merge'], default='flag',
+        help='report near-duplicate headwords, or merge them into the first one with their findoutmore rows')
+    parser_import.add_argument('--max-distance', type=int, default=NearDuplicateIndex.MAX_DISTANCE,
+        help='edits that make two headwords near-duplicates')
+    parser_import.add_argument('--report', metavar='FILE', help='write the near-duplicates here as JSON lines')
+    parser_duplicates = subparsers.add_parser('duplicates', help='print the pairs of near-duplicate headwords')
+    parser_duplicates.add_argument('--max-distance', type=int, default=NearDuplicateIndex.MAX_DISTANCE,
+        help='edits that make two headwords near-duplicates')
+    parser_sync = subparsers.add_parser('sync', help='apply the edits of the text files to the database and back')
+    parser_sync.add_argument('--headwords', default='headwords.txt', help='headwords text file')
+    parser_sync.add_argument('--findoutmore', default='findoutmore.txt', help='findoutmore text file')
+    direction = parser_sync.add_mutually_exclusive_group()
+    direction.add_argument('--pull', action='store_true', help='only apply the edits of the text files to the database')
+    direction.add_argument('--push', action='store_true',
+        help='only rewrite the text files from the database, dropping their edits since the last sync')
+    parser_levels = subparsers.add_parser('levels', help='set the level of every headword to its SubClass depth')
+    parser_levels.add_argument('--dry-run', action='store_true', help='only print the levels that would change')
+    parser_sequence = subparsers.add_parser('sequence', help='compute and store the learning sequence')
+    parser_sequence.add_argument('--show', action='store_true', help='print the stored sequence without recomputing')
+    parser_optimize = subparsers.add_parser('optimize',
+        help='search a learning sequence with the least weight of backward edges')
+    parser_optimize.add_argument('--budget', type=float, default=60.0, help='seconds to search')
+    parser_optimize.add_argument('--epoch', type=float, default=10.0,
+        help='seconds between exchanges of the best order between the workers')
+    parser_optimize.add_argument('--workers', type=int, default=0, help='worker processes (default: one per core)')
+    parser_optimize.add_argument('--seed', type=int, default=1, help='random seed of the first worker')
+    parser_optimize.add_argument('--subclass-weight', type=int, default=2,
+        help='weight of a backward SubClass edge; Depends and RDepends weigh 1')
+    parser_optimize.add_argument('--violations', metavar='FILE', help='write the backward edges here as JSON lines')
+    parser_optimize.add_argument('--save', action='store_true', help='store the order in the SEQUENCE table')
+    parser_snapshot = subparsers.add_parser('snapshot', help='write the memory-mapped graph snapshot')
+    parser_snapshot.add_argument('--output', default='yoes.csr', help='snapshot file to write')
+    parser_prerequisites = subparsers.add_parser('prerequisites', help='print everything to learn before a headword')
+    parser_prerequisites.add_argument('headword')
+    parser_prerequisites.add_argument('--dependents', action='store_true',
+        help='print everything building on the headword instead')
+    parser_path = subparsers.add_parser('path', help='print the shortest chains of findoutmore edges between two headwords')
+    parser_path.add_argument('from_headword')
+    parser_path.add_argument('to_headword')
+    parser_path.add_argument('-k', type=int, default=1, help='number of shortest paths to print')
+    parser_path.add_argument('--type', type=int, action='append', help='only follow edges of this type id (repeatable)')
+    parser_cycles = subparsers.add_parser('cycles', help='print every group of headwords on a prerequisite cycle')
+    parser_cycles.add_argument('--type', type=int, action='append',
+        help='only follow edges of this type id (repeatable, default: 1, 2 and 3)')
+    parser_serve = subparsers.add_parser('serve', help='serve the database as HTTP/JSON on localhost (Python 3)')
+    parser_serve.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser_serve.add_argument('--port', type=int, default=8080, help='port to listen on')
+    parser_loadtest = subparsers.add_parser('loadtest', help='load test a running service (Python 3)')
+    parser_loadtest.add_argument('--host', default='127.0.0.1', help='address of the service')
+    parser_loadtest.add_argument('--port', type=int, default=8080, help='port of the service')
+    parser_loadtest.add_argument('--clients', type=int, default=20, help='concurrent clients')
+    parser_loadtest.add_argument('--requests', type=int, default=500, help='requests per client')
+    parser_loadtest.add_argument('--writes', type=float, default=0.0, help='share of requests that write a level')
+    if not options.parse_known_args(argv)[1]:  # nothing but the options above: open the editor
+        argv = argv + ['gui']
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.trace else logging.INFO,
+        format=LOGGING_FORMAT if args.log_format == 'long' else LOGGING_SHORT_FORMAT,
+        datefmt=LOGGING_DATE_FORMAT,
+        filename=args.log,
+        filemode='w')
+    logger.info('Start logging ...')
+    if args.profile is not None or args.trace:
+        PROFILER.enable(args.trace)
+    try:
+        return {'gui': command_gui, 'import': command_import, 'duplicates': command_duplicates, 'sync': command_sync,
+            'levels': command_levels, 'sequence': command_sequence, 'optimize': command_optimize, 'snapshot': command_snapshot,
+            'prerequisites': command_prerequisites, 'path': command_path, 'cycles': command_cycles,
+            'serve': command_serve, 'loadtest': command_loadtest}[args.command](args)
+    finally:
+        if args.profile is not None:
+            PROFILER.dump(args.profile)
+        logger.info('End logging ...')
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
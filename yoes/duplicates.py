@@ -0,0 +1,104 @@
+"""Near-duplicate headwords: the same name up to case and a few typing errors.
+
+NearDuplicateIndex finds every indexed headword within max_distance edits
+(Levenshtein) of a new one without comparing it to all of them. A headword
+of length n is cut into max_distance + 1 segments and each segment is
+indexed under (n, segment number, text); d <= max_distance edits touch at
+most d segments, so a near-duplicate shares at least one segment, moved by at
+most max_distance places. A lookup only probes where the first untouched
+segment can be (Li et al., "Pass-Join"), so it takes a constant number of
+dictionary probes, and checks the candidates found with a bounded edit
+distance: indexing n headwords costs O(n) probes.
+"""
+
+from __future__ import absolute_import
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+def within(a, b, d):
+    """Tell whether a and b are at most d edits apart.
+
+    Dropping a common prefix keeps the distance, and then the first
+    characters differ, so one of the three edits of them must be used.
+    """
+    if d == 0:
+        return a == b
+    if abs(len(a) - len(b)) > d:
+        return False
+    i = 0
+    n = min(len(a), len(b))
+    while i < n and a[i] == b[i]:
+        i += 1
+    if i == n:
+        return True
+    return within(a[i + 1:], b[i + 1:], d - 1) or within(a[i + 1:], b[i:], d - 1) or within(a[i:], b[i + 1:], d - 1)
+
+def edit_distance(a, b, limit):
+    """Return the Levenshtein distance of a and b, or limit + 1 if it is larger than limit."""
+    for distance in range(limit + 1):
+        if within(a, b, distance):
+            return distance
+    return limit + 1
+
+class NearDuplicateIndex():
+    """Headwords by segment, to find those within max_distance edits of another, ignoring case.
+
+    Headwords shorter than min_length only match when equal up to case:
+    one edit turns too many short names into other real ones.
+    """
+    MAX_DISTANCE = 1
+    MIN_LENGTH = 5
+
+    def __init__(self, max_distance=MAX_DISTANCE, min_length=MIN_LENGTH):
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.names = dict()         # lowercase headword -> (headword, id) indexed first
+        self.segments = dict()      # (length, segment number, text) -> [lowercase headwords]
+
+    def split(self, length):
+        """Return the (start, size) of the segments of a headword of length."""
+        count = self.max_distance + 1
+        return [(length * k // count, length * (k + 1) // count - length * k // count) for k in range(count)]
+
+    def add(self, headword, headword_id):
+        key = headword.lower()
+        if key in self.names:
+            return
+        self.names[key] = (headword, headword_id)
+        if len(key) >= self.min_length:
+            for (k, (start, size)) in enumerate(self.split(len(key))):
+                self.segments.setdefault((len(key), k, key[start:start + size]), list()).append(key)
+
+    def find(self, headword):
+        """Return [(distance, headword, id)] of the indexed near-duplicates of headword, closest first."""
+        key = headword.lower()
+        found = dict()
+        if key in self.names:
+            found[key] = 0
+        if len(key) >= self.min_length:
+            d = self.max_distance
+            for length in range(max(self.min_length, len(key) - d), len(key) + d + 1):
+                delta = len(key) - length
+                for (k, (start, size)) in enumerate(self.split(length)):
+                    for shift in range(-d, d + 1):
+                        # segment k is the first untouched one: at least k edits before it, shifting it
+                        # by shift, and the others after it
+                        if abs(shift) + abs(delta - shift) > d or abs(delta - shift) > d - k:
+                            continue
+                        if start + shift < 0 or start + shift + size > len(key):
+                            continue
+                        for candidate in self.segments.get((length, k, key[start + shift:start + shift + size]), ()):
+                            if candidate not in found:
+                                distance = edit_distance(key, candidate, d)
+                                if distance <= d:
+                                    found[candidate] = distance
+        return sorted((distance,) + self.names[candidate] for (candidate, distance) in found.items())
+
+    def find_all(self):
+        """Yield (headword, id, [(distance, headword, id)]) for every indexed headword with near-duplicates."""
+        for (headword, headword_id) in sorted(self.names.values()):
+            similar = [match for match in self.find(headword) if match[2] != headword_id]
+            if similar:
+                yield (headword, headword_id, similar)
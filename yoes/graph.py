@@ -0,0 +1,869 @@
+"""In-memory structures over the headwords: graph, SubClass hierarchy, search index and learning sequence."""
+
+from __future__ import absolute_import
+
+import heapq
+import bisect
+import itertools
+import logging
+import threading
+
+from .profile import PROFILER
+
+logger = logging.getLogger(__name__)
+
+class HeadwordGraph():
+    """In-memory copy of HEADWORDS/FINDOUTMORE keyed by integer id.
+
+    Answers the same queries as DbStorage with dictionary reads, and is kept
+    in sync by the DbStorage write methods once attached with load_graph().
+    """
+    def __init__(self):
+        self.ids = dict()           # headword -> id
+        self.headwords = dict()     # id -> headword
+        self.levels = dict()        # id -> level
+        self.to_edges = dict()      # from_id -> {to_id: type_id}
+        self.from_edges = dict()    # to_id -> {from_id: type_id}
+        self.closure = None         # PrerequisiteClosure kept up to date by the edge changes
+        self.order = None           # TopologicalOrder kept valid by the headword and edge changes
+
+    def load(self, db):
+        """Load every headword and findoutmore row from a DbStorage."""
+        for (headword_id, headword, level) in db.query_all_headwords():
+            self.add_headword(headword_id, headword, level)
+        for (from_id, to_id, type_id) in db.query_all_findoutmore():
+            self.add_findoutmore(from_id, to_id, type_id)
+        logger.info('graph loaded: %s headwords', len(self.ids))
+
+    def add_headword(self, headword_id, headword, level=-1):
+        old_id = self.ids.get(headword)
+        if old_id is not None and old_id != headword_id:
+            self.remove_headword(old_id)
+        old_headword = self.headwords.get(headword_id)
+        if old_headword is not None and old_headword != headword:
+            self.remove_headword(headword_id)
+        self.ids[headword] = headword_id
+        self.headwords[headword_id] = headword
+        self.levels[headword_id] = level
+        self.to_edges.setdefault(headword_id, dict())
+        self.from_edges.setdefault(headword_id, dict())
+        if self.order is not None:
+            self.order.add_headword(headword_id)
+
+    def remove_headword(self, headword_id):
+        for to_id in list(self.to_edges[headword_id]):
+            self.discard_findoutmore(headword_id, to_id)
+        for from_id in list(self.from_edges[headword_id]):
+            self.discard_findoutmore(from_id, headword_id)
+        headword = self.headwords.pop(headword_id)
+        del self.ids[headword]
+        del self.levels[headword_id]
+        del self.to_edges[headword_id]
+        del self.from_edges[headword_id]
+        if self.order is not None:
+            self.order.remove_headword(headword_id)
+
+    def add_findoutmore(self, from_id, to_id, type_id):
+        # rows pointing at a replaced headword are hidden by V_FINDOUTMORE too
+        if from_id not in self.headwords or to_id not in self.headwords:
+            return
+        old_type_id = self.to_edges[from_id].get(to_id)
+        self.to_edges[from_id][to_id] = type_id
+        self.from_edges[to_id][from_id] = type_id
+        if self.closure is not None:
+            self.closure.update_edge(from_id, to_id, old_type_id, type_id)
+        if self.order is not None:
+            self.order.update_edge(from_id, to_id, old_type_id, type_id)
+
+    def discard_findoutmore(self, from_id, to_id):
+        type_id = self.to_edges.get(from_id, dict()).pop(to_id, None)
+        if type_id is not None:
+            del self.from_edges[to_id][from_id]
+            if self.closure is not None:
+                self.closure.update_edge(from_id, to_id, type_id, None)
+            if self.order is not None:
+                self.order.update_edge(from_id, to_id, type_id, None)
+
+    def names(self, ids):
+        return sorted(self.headwords[i] for i in ids)
+
+    def find_cycles(self, type_ids):
+        """Return the sorted headwords of every strongly connected component with a cycle of type_ids edges."""
+        def successors(headword_id):
+            return [to_id for (to_id, type_id) in self.to_edges[headword_id].items() if type_id in type_ids]
+        cycles = list()
+        for component in strongly_connected_components(self.headwords, successors):
+            if len(component) > 1 or component[0] in successors(component[0]):
+                cycles.append(self.names(component))
+        return sorted(cycles)
+
+    def query_headwords_bylevel(self, level):
+        return sorted((headword, level) for (headword_id, headword) in self.headwords.items()
+            if self.levels[headword_id] == level)
+
+    def query_from_headwords(self, to_headword):
+        to_id = self.ids.get(to_headword)
+        if to_id is None:
+            return []
+        return [(headword,) for headword in self.names(self.from_edges[to_id])]
+
+    def query_to_headwords(self, from_headword):
+        from_id = self.ids.get(from_headword)
+        if from_id is None:
+            return []
+        return [(headword,) for headword in self.names(self.to_edges[from_id])]
+
+    def query_level(self, headword):
+        headword_id = self.ids.get(headword)
+        if headword_id is None:
+            return None
+        return (self.levels[headword_id],)
+
+    def query_type(self, from_headword, to_headword):
+        from_id = self.ids.get(from_headword)
+        to_id = self.ids.get(to_headword)
+        if from_id is None or to_id is None:
+            return None
+        type_id = self.to_edges[from_id].get(to_id)
+        if type_id is None:
+            return None
+        return (type_id,)
+
+    def query_headword_byid(self, headword_id):
+        if headword_id not in self.headwords:
+            return None
+        return (self.headwords[headword_id], self.levels[headword_id])
+
+    def query_to_ids(self, from_id, type_id=None):
+        return [(to_id, edge_type_id) for (to_id, edge_type_id) in self.to_edges.get(from_id, dict()).items()
+            if type_id is None or edge_type_id == type_id]
+
+    def query_from_ids(self, to_id, type_id=None):
+        return [(from_id, edge_type_id) for (from_id, edge_type_id) in self.from_edges.get(to_id, dict()).items()
+            if type_id is None or edge_type_id == type_id]
+
+    def query_findoutmore_bytype(self, type_id):
+        return [(self.headwords[from_id], self.headwords[to_id])
+            for (from_id, to_edges) in self.to_edges.items()
+            for (to_id, edge_type_id) in to_edges.items() if edge_type_id == type_id]
+
+    def insert_headword(self, headword_id, headword, level=-1):
+        self.add_headword(headword_id, headword, level)
+
+    def update_level(self, headword, level):
+        headword_id = self.ids.get(headword)
+        if headword_id is not None:
+            self.levels[headword_id] = level
+
+    def rename_headword(self, headword, new_headword):
+        headword_id = self.ids.pop(headword, None)
+        if headword_id is not None:
+            self.ids[new_headword] = headword_id
+            self.headwords[headword_id] = new_headword
+
+    def insert_findoutmore(self, from_name, to_name, type_id):
+        from_id = self.ids.get(from_name)
+        to_id = self.ids.get(to_name)
+        if from_id is not None and to_id is not None:
+            self.add_findoutmore(from_id, to_id, type_id)
+
+    def remove_findoutmore(self, from_name, to_name):
+        from_id = self.ids.get(from_name)
+        to_id = self.ids.get(to_name)
+        if from_id is not None and to_id is not None:
+            self.discard_findoutmore(from_id, to_id)
+
+    def remove_findoutmore_by_fromname_typeid(self, from_name, type_id):
+        from_id = self.ids.get(from_name)
+        if from_id is None:
+            return
+        for (to_id, edge_type_id) in list(self.to_edges[from_id].items()):
+            if edge_type_id == type_id:
+                self.discard_findoutmore(from_id, to_id)
+
+class HeadwordHierarchy():
+    """SubClass forest built in memory from one query of the SubClass edges.
+
+    walk() yields (parent, headword) pairs in Treeview insertion order, where
+    parent is '' for the level 0 roots. SubClass cycles are collected in
+    self.cycles instead of being followed.
+    """
+    SUBCLASS_TYPE_ID = 2
+
+    def __init__(self):
+        self.roots = list()
+        self.children = dict()      # parent headword -> sorted sub headwords
+        self.parents = dict()       # sub headword -> sorted parent headwords
+        self.cycles = list()
+
+    def load(self, db):
+        """Load the level 0 roots and all SubClass edges from a DbStorage."""
+        roots = [row[0] for row in db.query_headwords_bylevel(0)]
+        edges = db.query_findoutmore_bytype(self.SUBCLASS_TYPE_ID)
+        self.build(roots, edges)
+
+    def build(self, roots, edges):
+        """Build the forest from root headwords and (sub, parent) edges."""
+        self.roots = sorted(roots)
+        self.children = dict()
+        self.parents = dict()
+        for (sub_headword, headword) in edges:
+            self.children.setdefault(headword, list()).append(sub_headword)
+            self.parents.setdefault(sub_headword, list()).append(headword)
+        for sub_headwords in self.children.values():
+            sub_headwords.sort()
+        for headwords in self.parents.values():
+            headwords.sort()
+        self.cycles = self.find_cycles()
+        for cycle in self.cycles:
+            logger.warning('SubClass cycle: %s', ' -> '.join(cycle))
+
+    def find_cycles(self):
+        """Return every SubClass cycle found by an iterative depth first search."""
+        cycles = list()
+        done = set()
+        for start in sorted(self.children):
+            if start in done:
+                continue
+            path = [start]
+            on_path = set(path)
+            stack = [iter(self.children.get(start, ()))]
+            while stack:
+                sub_headword = next(stack[-1], None)
+                if sub_headword is None:
+                    stack.pop()
+                    headword = path.pop()
+                    on_path.discard(headword)
+                    done.add(headword)
+                    continue
+                if sub_headword in on_path:
+                    cycles.append(path[path.index(sub_headword):] + [sub_headword])
+                elif sub_headword not in done:
+                    path.append(sub_headword)
+                    on_path.add(sub_headword)
+                    stack.append(iter(self.children.get(sub_headword, ())))
+        return cycles
+
+    def depths(self):
+        """Return ({headword: depth}, [(headword, problem, parents)]) of the forest by one breadth first pass.
+
+        The tops, with sub headwords and no parent, are at depth 0. A headword
+        with several parents gets the smallest depth and is reported as
+        'parents'; one only reachable through a SubClass cycle gets no depth
+        and is reported as 'cycle'.
+        """
+        depths = dict((headword, 0) for headword in self.children if headword not in self.parents)
+        frontier = sorted(depths)
+        while frontier:
+            next_frontier = list()
+            for headword in frontier:
+                for sub_headword in self.children.get(headword, ()):
+                    if sub_headword not in depths:
+                        depths[sub_headword] = depths[headword] + 1
+                        next_frontier.append(sub_headword)
+            frontier = next_frontier
+        conflicts = list()
+        for (sub_headword, parents) in sorted(self.parents.items()):
+            if sub_headword not in depths:
+                conflicts.append((sub_headword, 'cycle', parents))
+            elif len(parents) > 1:
+                conflicts.append((sub_headword, 'parents', parents))
+        return (depths, conflicts)
+
+    def set_level(self, headword, level):
+        """Keep the sorted root list in step with a LEVEL change."""
+        i = bisect.bisect_left(self.roots, headword)
+        is_root = i < len(self.roots) and self.roots[i] == headword
+        if level == 0 and not is_root:
+            self.roots.insert(i, headword)
+        elif level != 0 and is_root:
+            del self.roots[i]
+
+    def load_parents(self, db, sub_headword):
+        """Re-read the SubClass parents of one headword; return the parents that changed."""
+        sub_id = db.query_headword_id(sub_headword)
+        parents = list()
+        if sub_id is not None:
+            parents = [db.query_headword_byid(row[0])[0]
+                for row in db.query_to_ids(sub_id, self.SUBCLASS_TYPE_ID)]
+        return self.set_parents(sub_headword, parents)
+
+    def set_parents(self, sub_headword, parents):
+        """Replace the SubClass parents of one headword; return the parents that changed."""
+        old_parents = set(self.parents.get(sub_headword, ()))
+        new_parents = set(parents)
+        for headword in old_parents - new_parents:
+            sub_headwords = self.children[headword]
+            sub_headwords.remove(sub_headword)
+            if not sub_headwords:
+                del self.children[headword]
+        for headword in new_parents - old_parents:
+            bisect.insort(self.children.setdefault(headword, list()), sub_headword)
+            cycle = self.find_path(sub_headword, headword)
+            if cycle is not None:
+                self.cycles.append(cycle + [sub_headword])
+                logger.warning('SubClass cycle: %s', ' -> '.join(cycle + [sub_headword]))
+        if new_parents:
+            self.parents[sub_headword] = sorted(new_parents)
+        else:
+            self.parents.pop(sub_headword, None)
+        return old_parents ^ new_parents
+
+    def find_path(self, headword, sub_headword):
+        """Return a SubClass path from headword down to sub_headword, or None."""
+        previous = {headword: None}
+        stack = [headword]
+        while stack:
+            current = stack.pop()
+            if current == sub_headword:
+                path = list()
+                while current is not None:
+                    path.append(current)
+                    current = previous[current]
+                return path[::-1]
+            for child in self.children.get(current, ()):
+                if child not in previous:
+                    previous[child] = current
+                    stack.append(child)
+        return None
+
+    def walk(self):
+        """Yield (parent, headword) in preorder, each headword at most once."""
+        seen = set()
+        for root in self.roots:
+            if root in seen:
+                continue
+            seen.add(root)
+            yield ('', root)
+            stack = [(root, iter(self.children.get(root, ())))]
+            while stack:
+                (headword, sub_headwords) = stack[-1]
+                sub_headword = next(sub_headwords, None)
+                if sub_headword is None:
+                    stack.pop()
+                elif sub_headword not in seen:
+                    seen.add(sub_headword)
+                    yield (headword, sub_headword)
+                    stack.append((sub_headword, iter(self.children.get(sub_headword, ()))))
+
+class HeadwordIndex():
+    """Case-insensitive n-gram index over headwords for the as-you-type filter.
+
+    search() answers the same substring match as LIKE '%key%', sorted like
+    ORDER BY HEADWORD. Recent results are kept so that typing one more
+    character only narrows the previous result instead of searching again.
+    Searches may run on a QueryExecutor thread, so changes and reads take the lock.
+    """
+    NGRAM_SIZE = 3
+    RECENT_SIZE = 8
+
+    def __init__(self):
+        self.headwords = list()     # sorted headwords
+        self.ngrams = dict()        # lowercase n-gram -> set of headwords
+        self.recent = list()        # [(lowercase key, rows)], newest last
+        self.lock = threading.RLock()
+
+    def load(self, db):
+        """Index every headword of a DbStorage."""
+        headwords = sorted(row[1] for row in db.query_all_headwords())
+        with self.lock:
+            self.headwords = headwords
+            self.ngrams = dict()
+            for headword in self.headwords:
+                self.add_ngrams(headword)
+            self.recent = list()
+        logger.info('search index loaded: %s headwords, %s n-grams', len(self.headwords), len(self.ngrams))
+
+    def split_ngrams(self, text):
+        """Return the n-grams of every size up to NGRAM_SIZE found in text."""
+        ngrams = set()
+        for size in range(1, min(self.NGRAM_SIZE, len(text)) + 1):
+            for i in range(len(text) - size + 1):
+                ngrams.add(text[i:i + size])
+        return ngrams
+
+    def add_ngrams(self, headword):
+        for ngram in self.split_ngrams(headword.lower()):
+            self.ngrams.setdefault(ngram, set()).add(headword)
+
+    def insert_headword(self, headword):
+        with self.lock:
+            i = bisect.bisect_left(self.headwords, headword)
+            if i < len(self.headwords) and self.headwords[i] == headword:
+                return
+            self.headwords.insert(i, headword)
+            self.add_ngrams(headword)
+            self.recent = list()
+
+    def remove_headword(self, headword):
+        with self.lock:
+            i = bisect.bisect_left(self.headwords, headword)
+            if i == len(self.headwords) or self.headwords[i] != headword:
+                return
+            del self.headwords[i]
+            for ngram in self.split_ngrams(headword.lower()):
+                postings = self.ngrams[ngram]
+                postings.discard(headword)
+                if not postings:
+                    del self.ngrams[ngram]
+            self.recent = list()
+
+    def search(self, key=None):
+        """Return [(headword,)] containing key, case-insensitively, in sorted order."""
+        with self.lock:
+            if key is None or key == '':
+                return [(headword,) for headword in self.headwords]
+            key = key.lower()
+            for (recent_key, recent_rows) in reversed(self.recent):
+                if recent_key == key:
+                    return recent_rows
+                if recent_key in key:
+                    rows = [row for row in recent_rows if key in row[0].lower()]
+                    break
+            else:
+                rows = [(headword,) for headword in sorted(self.lookup(key))]
+            self.recent.append((key, rows))
+            del self.recent[:-self.RECENT_SIZE]
+            return rows
+
+    def lookup(self, key):
+        """Return the unsorted set of headwords containing the lowercase key."""
+        size = min(self.NGRAM_SIZE, len(key))
+        ngrams = [key[i:i + size] for i in range(len(key) - size + 1)]
+        postings = sorted((self.ngrams.get(ngram, set()) for ngram in set(ngrams)), key=len)
+        headwords = set(postings[0])
+        for posting in postings[1:]:
+            headwords.intersection_update(posting)
+            if not headwords:
+                break
+        if len(key) > self.NGRAM_SIZE:
+            headwords = set(headword for headword in headwords if key in headword.lower())
+        return headwords
+
+    def page(self, after=None, limit=100, inclusive=False):
+        """Return [(headword,)] of up to limit headwords sorted after a headword."""
+        with self.lock:
+            if after is None:
+                i = 0
+            elif inclusive:
+                i = bisect.bisect_left(self.headwords, after)
+            else:
+                i = bisect.bisect_right(self.headwords, after)
+            return [(headword,) for headword in self.headwords[i:i + limit]]
+
+    def search_prefix(self, prefix):
+        """Return [(headword,)] starting with prefix (case-sensitive), in sorted order."""
+        with self.lock:
+            i = bisect.bisect_left(self.headwords, prefix)
+            rows = list()
+            while i < len(self.headwords) and self.headwords[i].startswith(prefix):
+                rows.append((self.headwords[i],))
+                i += 1
+            return rows
+
+class LearningSequence():
+    """Learning order of the headwords over the Depends/SubClass/RDepends edges.
+
+    An edge FROM -> TO of one of SEQUENCE_TYPE_IDS means TO has to be learned
+    before FROM. The order is Kahn's algorithm with ties broken by headword,
+    so the same data always gives the same order. When only cycles are left,
+    the first remaining headword by name is taken and recorded in self.breaks.
+    """
+    SEQUENCE_TYPE_IDS = (1, 2, 3)
+
+    def __init__(self):
+        self.order = list()         # headword ids in learning order
+        self.breaks = list()        # headword ids taken while still waiting for a prerequisite
+
+    def load(self, db):
+        """Compute the order from all headwords and findoutmore rows of a DbStorage."""
+        headwords = dict((row[0], row[1]) for row in db.query_all_headwords())
+        edges = [(from_id, to_id) for (from_id, to_id, type_id) in db.query_all_findoutmore()
+            if type_id in self.SEQUENCE_TYPE_IDS]
+        self.build(headwords, edges)
+
+    def build(self, headwords, edges):
+        """Compute the order from {id: headword} and (from id, to id) edges."""
+        dependents = dict((headword_id, list()) for headword_id in headwords)
+        waiting = dict((headword_id, 0) for headword_id in headwords)
+        for (from_id, to_id) in edges:
+            if from_id in headwords and to_id in headwords and from_id != to_id:
+                dependents[to_id].append(from_id)
+                waiting[from_id] += 1
+
+        by_name = sorted((headword, headword_id) for (headword_id, headword) in headwords.items())
+        ready = [item for item in by_name if waiting[item[1]] == 0]
+        heapq.heapify(ready)
+        next_by_name = 0
+        self.order = list()
+        self.breaks = list()
+        while len(self.order) < len(headwords):
+            if not ready:
+                while waiting[by_name[next_by_name][1]] < 0:
+                    next_by_name += 1
+                heapq.heappush(ready, by_name[next_by_name])
+                self.breaks.append(by_name[next_by_name][1])
+            (headword, headword_id) = heapq.heappop(ready)
+            if waiting[headword_id] < 0:
+                continue
+            waiting[headword_id] = -1
+            self.order.append(headword_id)
+            for dependent_id in dependents[headword_id]:
+                if waiting[dependent_id] > 0:
+                    waiting[dependent_id] -= 1
+                    if waiting[dependent_id] == 0:
+                        heapq.heappush(ready, (headwords[dependent_id], dependent_id))
+        if self.breaks:
+            logger.warning('learning sequence: %s cycles broken', len(self.breaks))
+
+    def ranks(self):
+        """Return (headword id, rank) rows, rank 0 first."""
+        return [(headword_id, rank) for (rank, headword_id) in enumerate(self.order)]
+
+def iter_bits(mask):
+    """Yield the positions of the set bits of a non-negative int, lowest first."""
+    digits = bin(mask)[:1:-1]
+    position = digits.find('1')
+    while position >= 0:
+        yield position
+        position = digits.find('1', position + 1)
+
+def strongly_connected_components(nodes, successors):
+    """Yield the strongly connected components among nodes, each after every component it reaches.
+
+    Tarjan's algorithm, iterative; successors outside nodes are skipped.
+    """
+    nodes = set(nodes)
+    index = dict()
+    low = dict()
+    stack = list()
+    on_stack = set()
+    for start in nodes:
+        if start in index:
+            continue
+        index[start] = low[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        work = [(start, iter(successors(start)))]
+        while work:
+            (node, node_successors) = work[-1]
+            for successor in node_successors:
+                if successor not in nodes:
+                    continue
+                if successor not in index:
+                    index[successor] = low[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(successors(successor))))
+                    break
+                if successor in on_stack:
+                    low[node] = min(low[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                if low[node] == index[node]:
+                    component = list()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    yield component
+
+def shortest_path(source, target, successors, predecessors):
+    """Return a shortest [source, ..., target] path, or None.
+
+    Bidirectional breadth first search: the smaller frontier is expanded one
+    whole level at a time, and the search stops at the first level where the
+    two sides meet, so only about the square root of a one-sided search's
+    headwords are visited.
+    """
+    if source == target:
+        return [source]
+    sides = [({source: None}, {source: 0}, [source], successors), ({target: None}, {target: 0}, [target], predecessors)]
+    while sides[0][2] and sides[1][2]:
+        side = 0 if len(sides[0][2]) <= len(sides[1][2]) else 1
+        (parents, depths, frontier, step) = sides[side]
+        (other_parents, other_depths) = sides[1 - side][:2]
+        next_frontier = list()
+        meetings = list()
+        for node in frontier:
+            for neighbour in step(node):
+                if neighbour not in parents:
+                    parents[neighbour] = node
+                    depths[neighbour] = depths[node] + 1
+                    next_frontier.append(neighbour)
+                    if neighbour in other_depths:
+                        meetings.append((depths[neighbour] + other_depths[neighbour], neighbour))
+        if meetings:
+            meeting = min(meetings)[1]
+            path = list()
+            node = meeting
+            while node is not None:
+                path.append(node)
+                node = sides[0][0][node]
+            path.reverse()
+            node = sides[1][0][meeting]
+            while node is not None:
+                path.append(node)
+                node = sides[1][0][node]
+            return path
+        sides[side] = (parents, depths, next_frontier, step)
+    return None
+
+def k_shortest_paths(source, target, successors, predecessors, k):
+    """Return up to k shortest loopless paths, shortest first (Yen's algorithm over shortest_path)."""
+    path = shortest_path(source, target, successors, predecessors)
+    if path is None:
+        return []
+    paths = [path]
+    candidates = list()
+    while len(paths) < k:
+        last = paths[-1]
+        for i in range(len(last) - 1):
+            root = last[:i + 1]
+            removed_nodes = set(root[:-1])
+            removed_edges = set((path[i], path[i + 1]) for path in paths if path[:i + 1] == root)
+            def spur_successors(node):
+                return [n for n in successors(node) if n not in removed_nodes and (node, n) not in removed_edges]
+            def spur_predecessors(node):
+                return [n for n in predecessors(node) if n not in removed_nodes and (n, node) not in removed_edges]
+            spur = shortest_path(root[-1], target, spur_successors, spur_predecessors)
+            if spur is not None:
+                candidate = root[:-1] + spur
+                if candidate not in candidates and candidate not in paths:
+                    candidates.append(candidate)
+        if not candidates:
+            break
+        candidates.sort(key=len)
+        paths.append(candidates.pop(0))
+    return paths
+
+class PrerequisiteClosure():
+    """Transitive closure of the prerequisite edges of a HeadwordGraph, as bitsets.
+
+    An edge FROM -> TO of one of TYPE_IDS makes TO a prerequisite of FROM.
+    ancestors[id] is a Python int with the bit of every headword id to learn
+    before id, descendants[id] has the bits of every headword building on
+    it. Headwords on a cycle are their own prerequisites. An inserted edge
+    ORs its new bits into the affected sets. A removed edge recomputes only
+    the headwords that could reach it: the sets of all other headwords
+    cannot have used it.
+
+    Each set has up to one bit per headword, so the closure of V headwords
+    takes up to V*V/4 bytes: 25 MB at MAX_HEADWORDS, 2.5 GB at 10**5.
+    DbStorage.load_closure() does not build it for more than MAX_HEADWORDS.
+    """
+    TYPE_IDS = LearningSequence.SEQUENCE_TYPE_IDS
+    MAX_HEADWORDS = 10000
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.ancestors = dict()     # id -> bits of its prerequisites
+        self.descendants = dict()   # id -> bits of the headwords it is a prerequisite of
+
+    def successors(self, headword_id):
+        return [to_id for (to_id, type_id) in self.graph.to_edges.get(headword_id, dict()).items()
+            if type_id in self.TYPE_IDS]
+
+    def predecessors(self, headword_id):
+        return [from_id for (from_id, type_id) in self.graph.from_edges.get(headword_id, dict()).items()
+            if type_id in self.TYPE_IDS]
+
+    def build(self):
+        self.ancestors = dict()
+        self.descendants = dict()
+        self.compute(self.graph.headwords, self.successors, self.ancestors)
+        self.compute(self.graph.headwords, self.predecessors, self.descendants)
+        logger.info('prerequisite closure built: %s headwords', len(self.ancestors))
+
+    def compute(self, nodes, successors, closure):
+        """Set closure[x] for every x of nodes, trusting closure[y] of the successors y outside nodes."""
+        for component in strongly_connected_components(nodes, successors):
+            self.close_component(component, successors, closure)
+
+    def close_component(self, component, successors, closure):
+        members = 0
+        for member in component:
+            members |= 1 << member
+        reach = 0
+        cyclic = len(component) > 1
+        for member in component:
+            for successor in successors(member):
+                if members >> successor & 1:
+                    cyclic = True
+                else:
+                    reach |= closure.get(successor, 0) | 1 << successor
+        if cyclic:
+            reach |= members
+        for member in component:
+            closure[member] = reach
+
+    def update_edge(self, from_id, to_id, old_type_id, new_type_id):
+        """Follow a change of the type of an edge; None stands for no edge."""
+        was_prerequisite = old_type_id in self.TYPE_IDS
+        is_prerequisite = new_type_id in self.TYPE_IDS
+        if is_prerequisite and not was_prerequisite:
+            self.insert_edge(from_id, to_id)
+        elif was_prerequisite and not is_prerequisite:
+            self.remove_edge(from_id, to_id)
+
+    def insert_edge(self, from_id, to_id):
+        old_ancestors = self.ancestors.get(to_id, 0)
+        old_descendants = self.descendants.get(from_id, 0)
+        new_ancestors = old_ancestors | 1 << to_id
+        for headword_id in itertools.chain([from_id], iter_bits(old_descendants)):
+            self.ancestors[headword_id] = self.ancestors.get(headword_id, 0) | new_ancestors
+        new_descendants = old_descendants | 1 << from_id
+        for headword_id in itertools.chain([to_id], iter_bits(old_ancestors)):
+            self.descendants[headword_id] = self.descendants.get(headword_id, 0) | new_descendants
+
+    def remove_edge(self, from_id, to_id):
+        reaching = [from_id] + list(iter_bits(self.descendants.get(from_id, 0)))
+        reached = [to_id] + list(iter_bits(self.ancestors.get(to_id, 0)))
+        self.compute(reaching, self.successors, self.ancestors)
+        self.compute(reached, self.predecessors, self.descendants)
+
+    def is_prerequisite(self, before_id, after_id):
+        """Tell whether before_id has to be learned before after_id."""
+        return self.ancestors.get(after_id, 0) >> before_id & 1 == 1
+
+    def query_prerequisites(self, headword):
+        headword_id = self.graph.ids.get(headword)
+        if headword_id is None:
+            return []
+        return [(name,) for name in self.graph.names(iter_bits(self.ancestors.get(headword_id, 0)))]
+
+    def query_dependents(self, headword):
+        headword_id = self.graph.ids.get(headword)
+        if headword_id is None:
+            return []
+        return [(name,) for name in self.graph.names(iter_bits(self.descendants.get(headword_id, 0)))]
+
+    def query_is_prerequisite(self, before_headword, after_headword):
+        before_id = self.graph.ids.get(before_headword)
+        after_id = self.graph.ids.get(after_headword)
+        if before_id is None or after_id is None:
+            return False
+        return self.is_prerequisite(before_id, after_id)
+
+class CycleError(ValueError):
+    """A prerequisite edge that would close a cycle; cycle is [FROM, TO, ..., FROM] as headwords."""
+    def __init__(self, cycle):
+        ValueError.__init__(self, 'prerequisite cycle: %s' % ' -> '.join(cycle))
+        self.cycle = cycle
+
+class TopologicalOrder():
+    """Learning order of a HeadwordGraph kept valid while edges are inserted (Pearce and Kelly).
+
+    position[id] puts the TO of every edge FROM -> TO of TYPE_IDS before its
+    FROM. An inserted edge the order already agrees with costs one
+    comparison; otherwise only the headwords positioned between its two
+    ends are searched, either finding the cycle the edge would close or
+    reordering just the headwords found. Removing edges keeps an order
+    valid. Edges already on a cycle when the order is built, or inserted by
+    a bulk load despite closing one, are kept in self.cyclic and left out of
+    the order until they are removed.
+    """
+    TYPE_IDS = LearningSequence.SEQUENCE_TYPE_IDS
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.position = dict()      # id -> position, unique but not contiguous
+        self.cyclic = set()         # (from_id, to_id) edges left out of the order
+        self.next_position = 0
+
+    def later(self, headword_id):
+        """Return the ids that must come after headword_id."""
+        return [from_id for (from_id, type_id) in self.graph.from_edges.get(headword_id, dict()).items()
+            if type_id in self.TYPE_IDS and (from_id, headword_id) not in self.cyclic]
+
+    def earlier(self, headword_id):
+        """Return the ids that must come before headword_id."""
+        return [to_id for (to_id, type_id) in self.graph.to_edges.get(headword_id, dict()).items()
+            if type_id in self.TYPE_IDS and (headword_id, to_id) not in self.cyclic]
+
+    def build(self):
+        self.position = dict()
+        self.cyclic = set()
+        components = list(strongly_connected_components(self.graph.headwords, self.later))
+        for component in reversed(components):
+            members = set(component)
+            for member in component:
+                self.position[member] = len(self.position)
+            for member in component:
+                for from_id in self.later(member):
+                    if from_id in members:
+                        self.cyclic.add((from_id, member))
+        self.next_position = len(self.position)
+        logger.info('topological order built: %s headwords, %s edges on cycles', len(self.position), len(self.cyclic))
+
+    def add_headword(self, headword_id):
+        if headword_id not in self.position:
+            self.position[headword_id] = self.next_position
+            self.next_position += 1
+
+    def remove_headword(self, headword_id):
+        self.position.pop(headword_id, None)
+
+    def update_edge(self, from_id, to_id, old_type_id, new_type_id):
+        """Follow a change of the type of an edge; None stands for no edge."""
+        was_prerequisite = old_type_id in self.TYPE_IDS
+        is_prerequisite = new_type_id in self.TYPE_IDS
+        if is_prerequisite and not was_prerequisite:
+            if self.insert_edge(from_id, to_id) is not None:
+                self.cyclic.add((from_id, to_id))
+                logger.warning('edge on a cycle left out of the order: %s -> %s',
+                    self.graph.headwords[from_id], self.graph.headwords[to_id])
+        elif was_prerequisite and not is_prerequisite:
+            self.cyclic.discard((from_id, to_id))
+
+    def insert_edge(self, from_id, to_id):
+        """Reorder so that to_id comes before from_id.
+
+        Return None, or the ids [from_id, ..., to_id] of a path of edges already
+        putting from_id before to_id, leaving the order unchanged.
+        """
+        lower = self.position[from_id]
+        upper = self.position[to_id]
+        if upper < lower:
+            return None
+        if from_id == to_id:
+            return [from_id]
+        # what must come after from_id and is not yet after to_id
+        previous = {from_id: None}
+        stack = [from_id]
+        while stack:
+            headword_id = stack.pop()
+            for later_id in self.later(headword_id):
+                if later_id == to_id:
+                    path = [to_id]
+                    while headword_id is not None:
+                        path.append(headword_id)
+                        headword_id = previous[headword_id]
+                    return path[::-1]
+                if later_id not in previous and self.position[later_id] < upper:
+                    previous[later_id] = headword_id
+                    stack.append(later_id)
+        # what must come before to_id and is not yet before from_id
+        before = set([to_id])
+        stack = [to_id]
+        while stack:
+            headword_id = stack.pop()
+            for earlier_id in self.earlier(headword_id):
+                if earlier_id not in before and self.position[earlier_id] > lower:
+                    before.add(earlier_id)
+                    stack.append(earlier_id)
+        moved = sorted(before, key=self.position.get) + sorted(previous, key=self.position.get)
+        for (headword_id, position) in zip(moved, sorted(self.position[i] for i in moved)):
+            self.position[headword_id] = position
+        return None
+
+PROFILER.register(HeadwordGraph, ['load'])
+PROFILER.register(HeadwordHierarchy, ['load', 'load_parents'])
+PROFILER.register(HeadwordIndex, ['load', 'search'])
+PROFILER.register(LearningSequence, ['load'])
+PROFILER.register(PrerequisiteClosure, ['build', 'insert_edge', 'remove_edge'])
+PROFILER.register(TopologicalOrder, ['build', 'insert_edge'])
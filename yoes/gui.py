@@ -0,0 +1,639 @@
+"""Tk editor of yoes.db; imported only when the GUI is started."""
+
+from __future__ import absolute_import
+
+import bisect
+import logging
+import sqlite3
+import threading
+try:
+    import Tkinter as tk    # Python2: Tkinter first letter is uppercase in Python2
+    import ttk
+    import tkMessageBox as messagebox
+    import Queue as queue
+except ImportError:
+    import tkinter as tk
+    from tkinter import ttk
+    from tkinter import messagebox
+    import queue
+
+from .graph import HeadwordHierarchy, CycleError
+from .storage import DbStorage, WriteJournal, plan_levels
+from .profile import PROFILER
+
+logger = logging.getLogger(__name__)
+
+class RowsSource():
+    """Row source for VirtualListbox over an already fetched, sorted result."""
+    def __init__(self, rows):
+        self.row_list = rows
+
+    def count(self):
+        return len(self.row_list)
+
+    def rows(self, start, limit):
+        return [row[0] for row in self.row_list[start:start + limit]]
+
+    def position(self, headword):
+        i = bisect.bisect_left(self.row_list, (headword,))
+        if i < len(self.row_list) and self.row_list[i][0] == headword:
+            return i
+        return None
+
+class HeadwordPager():
+    """Row source for VirtualListbox over all headwords, paged with keyset queries.
+
+    The sort key of every row seen so far is remembered by position, so that
+    scrolling continues from a known key instead of using OFFSET.
+    """
+    def __init__(self, db):
+        self.db = db
+        self.total = db.query_headwords_count()
+        self.keys = dict()          # position -> headword
+
+    def count(self):
+        return self.total
+
+    def rows(self, start, limit):
+        if start in self.keys:
+            rows = self.db.query_headwords_page(self.keys[start], limit, inclusive=True)
+        elif start - 1 in self.keys:
+            rows = self.db.query_headwords_page(self.keys[start - 1], limit)
+        elif start == 0:
+            rows = self.db.query_headwords_page(None, limit)
+        else:
+            rows = self.db.query_headwords_offset(start, limit)
+        if len(self.keys) > 100000:
+            self.keys = dict()
+        headwords = [row[0] for row in rows]
+        for (i, headword) in enumerate(headwords):
+            self.keys[start + i] = headword
+        return headwords
+
+    def position(self, headword):
+        position = self.db.query_headword_position(headword)
+        self.keys[position] = headword
+        return position
+
+class VirtualListbox(tk.Listbox):
+    """Listbox that only holds the visible window of a row source.
+
+    The source provides count(), rows(start, limit) and position(headword).
+    Indices used with curselection() and get() are relative to the window,
+    see() takes an index into the whole source.
+    """
+    def __init__(self, master=None, **kw):
+        tk.Listbox.__init__(self, master, **kw)
+        self.source = RowsSource([])
+        self.offset = 0
+        self.yscrollcommand = None
+        self.bind('<MouseWheel>', lambda event: self.scroll(-1 if event.delta > 0 else 1, 'units'))
+        self.bind('<Button-4>', lambda event: self.scroll(-1, 'units'))
+        self.bind('<Button-5>', lambda event: self.scroll(1, 'units'))
+        self.bind('<Prior>', lambda event: self.scroll(-1, 'pages'))
+        self.bind('<Next>', lambda event: self.scroll(1, 'pages'))
+        self.bind('<Up>', self.on_keypress_up)
+        self.bind('<Down>', self.on_keypress_down)
+
+    def window_size(self):
+        return int(self.cget('height'))
+
+    def show(self, source, index=0):
+        self.source = source
+        self.scroll_to(index)
+
+    def scroll_to(self, index):
+        last = max(0, self.source.count() - self.window_size())
+        self.offset = min(max(0, index), last)
+        self.delete(0, tk.END)
+        rows = self.source.rows(self.offset, self.window_size())
+        if rows:
+            self.insert(tk.END, *rows)
+        if self.yscrollcommand is not None:
+            self.yscrollcommand(*self.yview())
+
+    def scroll(self, number, what='units'):
+        if what == 'pages':
+            number *= self.window_size()
+        self.scroll_to(self.offset + number)
+        return 'break'
+
+    def see(self, index):
+        if not self.offset <= index < self.offset + self.window_size():
+            self.scroll_to(index - self.window_size() // 2)
+        tk.Listbox.see(self, index - self.offset)
+
+    def yview(self, *args):
+        """Scrollbar protocol in terms of the whole source instead of the window."""
+        count = max(1, self.source.count())
+        if not args:
+            return (float(self.offset) / count, float(self.offset + self.window_size()) / count)
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * count))
+        elif args[0] == 'scroll':
+            self.scroll(int(args[1]), args[2])
+
+    def on_keypress_up(self, event):
+        if self.index(tk.ACTIVE) == 0 and self.offset > 0:
+            return self.scroll(-1)
+
+    def on_keypress_down(self, event):
+        if self.index(tk.ACTIVE) == self.window_size() - 1:
+            return self.scroll(1)
+
+class QueryExecutor():
+    """Run DbStorage queries on a worker thread and hand the results back to Tk.
+
+    Every query is submitted on a channel. A newer submit on the same channel
+    cancels the older query: it is skipped if it has not started, interrupted
+    if it is running on a pooled reader, and its result is dropped otherwise.
+    Results are delivered by poll(), which runs on the Tk thread via after().
+    """
+    POLL_INTERVAL = 20  # ms
+
+    def __init__(self, widget, db, poll_interval=POLL_INTERVAL):
+        self.widget = widget
+        self.db = db
+        self.poll_interval = poll_interval
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.generations = dict()   # channel -> generation of its latest request
+        self.running = None         # channel of the request the worker is running
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name='QueryExecutor')
+        self.thread.daemon = True
+        self.thread.start()
+        self.after_id = widget.after(self.poll_interval, self.poll)
+
+    def cancel(self, channel):
+        """Cancel the pending or running query of a channel; return the new generation."""
+        with self.lock:
+            generation = self.generations.get(channel, 0) + 1
+            self.generations[channel] = generation
+            if self.running == channel:
+                self.db.interrupt(self.thread.ident)
+        return generation
+
+    def submit(self, channel, callback, function, *args):
+        """Run function(*args) on the worker and call callback(result) on the Tk thread."""
+        generation = self.cancel(channel)
+        self.requests.put((channel, generation, callback, function, args))
+
+    def is_current(self, channel, generation):
+        return self.generations.get(channel) == generation
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            (channel, generation, callback, function, args) = request
+            with self.lock:
+                if not self.is_current(channel, generation):
+                    continue
+                self.running = channel
+            try:
+                result = function(*args)
+            except sqlite3.OperationalError:
+                if self.is_current(channel, generation):
+                    logger.exception('query failed on %s', channel)
+                continue
+            finally:
+                with self.lock:
+                    self.running = None
+            self.results.put((channel, generation, callback, result))
+
+    def poll(self):
+        while True:
+            try:
+                (channel, generation, callback, result) = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if self.is_current(channel, generation):
+                callback(result)
+        self.after_id = self.widget.after(self.poll_interval, self.poll)
+
+    def close(self):
+        self.widget.after_cancel(self.after_id)
+        self.requests.put(None)
+        self.thread.join()
+
+class YoesApplication(tk.Frame):
+    PROFILE_FILENAME = 'yoes_profile.json'
+    PATH_COUNT = 5
+
+    def __init__(self, master=None, dbname='yoes.db'):
+        tk.Frame.__init__(self, master)
+        self.grid(sticky=tk.N+tk.S+tk.E+tk.W)
+        self.master.title('The Young Oxford Encyclopedia of Science')
+        self.bind('<Destroy>', self.on_destroy)
+        self.last_query_headword_key = ''
+        self.last_query_findoutmore_key = ''
+
+        self.db = DbStorage()
+        self.db.db_open(dbname)
+        self.db.load_graph()
+        self.db.load_search_index()
+        self.db.load_order()
+        self.journal = WriteJournal(self.db)
+        self.executor = QueryExecutor(self, self.db)
+        self.bind_all('<Control-z>', self.on_undo)
+        self.bind_all('<Control-y>', self.on_redo)
+        self.bind_all('<F12>', self.on_toggle_profiler)
+
+        #self.txtfile = TxtfileStorage(self.db)
+        #self.db.create_tables()
+        #self.txtfile.process_headwords_txtfile('headwords.txt')
+        #self.txtfile.process_findoutmore_txtfile('findoutmore.txt')
+        #self.db.db_save()
+
+        self.create_widgets()
+    
+    def create_widgets(self):
+        self.var_ent_headword = tk.StringVar()
+        self.entHeadword = tk.Entry(self, name='entHeadword', textvariable=self.var_ent_headword)
+        self.entHeadword.grid(row=0, column=1)
+
+        self.lstHeadwords = VirtualListbox(self, name='lstHeadwords')
+        self.lstHeadwords.grid(row=1, column=1)
+
+        self.var_ent_findoutmore = tk.StringVar()
+        self.entFindoutmore = tk.Entry(self, name='entFindoutmore', textvariable=self.var_ent_findoutmore)
+        self.entFindoutmore.grid(row=0, column=2)
+
+        self.lstFindoutmore = VirtualListbox(self, name='lstFindoutmore')
+        self.lstFindoutmore.grid(row=1, column=2)
+
+        self.var_ent_rfindoutmore = tk.StringVar()
+        self.entRFindoutmore = tk.Entry(self, name='entRFindoutmore', textvariable=self.var_ent_rfindoutmore)
+        self.entRFindoutmore.grid(row=0, column=0)
+
+        self.lstRFindoutmore = VirtualListbox(self, name='lstRFindoutmore')
+        self.lstRFindoutmore.grid(row=1, column=0)
+
+        self.OPTION_TYPE_LIST = dict(Undefined=0, Depends=1, SubClass=2, RDepends=3)
+        self.OPTION_TYPE_NAMES = dict((type_id, name) for (name, type_id) in self.OPTION_TYPE_LIST.items())
+        self.var_opt_type = tk.StringVar()
+        self.optType = tk.OptionMenu(self, self.var_opt_type, *self.OPTION_TYPE_LIST.keys())
+        self.optType.grid(row=2, column=2)
+
+        self.var_opt_rtype = tk.StringVar()
+        self.optRType = tk.OptionMenu(self, self.var_opt_rtype, *self.OPTION_TYPE_LIST.keys())
+        self.optRType.grid(row=2, column=0)
+
+        def on_buttoncommand_btnCommit():
+            self.commit_findoutmore_modification(self.var_ent_headword, self.var_ent_findoutmore, self.var_opt_type)
+        self.btnCommit = tk.Button(self, text='Commit', command=on_buttoncommand_btnCommit)
+        self.btnCommit.grid(row=3, column=2)
+
+        def on_buttoncommand_btnRCommit():
+            self.commit_findoutmore_modification(self.var_ent_rfindoutmore, self.var_ent_headword, self.var_opt_rtype)
+        self.btnRCommit = tk.Button(self, text='Commit', command=on_buttoncommand_btnRCommit)
+        self.btnRCommit.grid(row=3, column=0)
+
+        def on_keyrelease_entHeadwords(event):
+            self.listbox_submitkey_headwords(listbox=self.lstHeadwords, keystr=self.var_ent_headword.get())
+        def on_keyrelease_entFindoutmore(event):
+            self.listbox_submitkey_headwords(listbox=self.lstFindoutmore, keystr=self.var_ent_findoutmore.get())
+        def on_keyrelease_entRFindoutmore(event):
+            self.listbox_submitkey_headwords(listbox=self.lstRFindoutmore, keystr=self.var_ent_rfindoutmore.get())
+        self.entHeadword.bind('<KeyRelease>', on_keyrelease_entHeadwords)
+        self.entFindoutmore.bind('<KeyRelease>', on_keyrelease_entFindoutmore)
+        self.entRFindoutmore.bind('<KeyRelease>', on_keyrelease_entRFindoutmore)
+
+        def on_keypress_escape_lstHeadwords(event):
+            self.listbox_showall_headwords(listbox=self.lstHeadwords, anchorstr=self.var_ent_headword.get())
+        def on_keypress_escape_lstFindoutmore(event):
+            self.listbox_showall_headwords(listbox=self.lstFindoutmore, anchorstr=self.var_ent_findoutmore.get())
+        def on_keypress_escape_lstRFindoutmore(event):
+            self.listbox_showall_headwords(listbox=self.lstRFindoutmore, anchorstr=self.var_ent_rfindoutmore.get())
+        self.lstHeadwords.bind('<KeyPress-Escape>'  , on_keypress_escape_lstHeadwords)
+        self.lstFindoutmore.bind('<KeyPress-Escape>', on_keypress_escape_lstFindoutmore)
+        self.lstRFindoutmore.bind('<KeyPress-Escape>', on_keypress_escape_lstRFindoutmore)
+
+        def on_listbox_select_lstHeadwords(event):
+            self.listbox_select_item(listbox=self.lstHeadwords, varstr=self.var_ent_headword)
+        def on_listbox_select_lstFindoutmore(event):
+            self.listbox_select_item(listbox=self.lstFindoutmore, varstr=self.var_ent_findoutmore)
+        def on_listbox_select_lstRFindoutmore(event):
+            self.listbox_select_item(listbox=self.lstRFindoutmore, varstr=self.var_ent_rfindoutmore)
+        self.lstHeadwords.bind('<<ListboxSelect>>', on_listbox_select_lstHeadwords)
+        self.lstFindoutmore.bind('<<ListboxSelect>>', on_listbox_select_lstFindoutmore)
+        self.lstRFindoutmore.bind('<<ListboxSelect>>', on_listbox_select_lstRFindoutmore)
+
+        self.trvHierarchy = ttk.Treeview(self, selectmode='extended')
+        self.trvHierarchy.grid(row=0, column=3, rowspan=4, columnspan=4)
+        self.trvHierarchy.bind('<<TreeviewSelect>>', self.on_treeview_select)
+        self.trvHierarchy.bind('<<TreeviewOpen>>', self.on_treeview_open)
+
+        self.OPTION_LEVEL_LIST = dict(Root=0, First=1, Second=2, Undefined=-1)
+        self.var_opt_level = tk.StringVar()
+        self.optLevel = tk.OptionMenu(self, self.var_opt_level, *self.OPTION_LEVEL_LIST.keys())
+        self.optLevel.grid(row=2, column=1)
+
+        def on_buttoncommand_btnUpdate():
+            self.update_headword_level()
+        self.btnUpdate = tk.Button(self, text='Update', command=on_buttoncommand_btnUpdate)
+        self.btnUpdate.grid(row=3, column=1)
+
+        def on_buttoncommand_btnPath():
+            self.show_paths()
+        self.btnPath = tk.Button(self, text='Path', command=on_buttoncommand_btnPath)
+        self.btnPath.grid(row=4, column=1)
+
+        def on_buttoncommand_btnLevels():
+            self.show_levels()
+        self.btnLevels = tk.Button(self, text='Levels', command=on_buttoncommand_btnLevels)
+        self.btnLevels.grid(row=4, column=3)
+
+        self.listbox_showall_headwords(listbox=self.lstHeadwords)
+        self.display_hierarchy()
+
+    def on_destroy(self, event):
+        self.executor.close()
+        self.journal.close()
+        self.db.db_close()
+
+    def listbox_showall_headwords(self, listbox, anchorstr=None):
+        source = self.listbox_showkey_headwords(listbox, None)
+
+        if anchorstr != None:
+            index = source.position(anchorstr)
+            listbox.see(index)
+
+    def listbox_showkey_headwords(self, listbox, keystr=None):
+        if keystr == None or keystr == '':
+            source = HeadwordPager(self.db)
+        else:
+            source = RowsSource(self.db.query_headwords_bykey(keystr))
+        listbox.show(source)
+
+        return source
+
+    def listbox_submitkey_headwords(self, listbox, keystr=None):
+        """Filter a listbox on the query executor; only the result for the latest key is shown."""
+        if keystr == None or keystr == '':
+            self.executor.cancel(listbox.winfo_name())
+            self.listbox_showkey_headwords(listbox, None)
+        else:
+            self.executor.submit(listbox.winfo_name(), lambda rows: listbox.show(RowsSource(rows)),
+                self.db.query_headwords_bykey, keystr)
+
+    def listbox_select_item(self, listbox, varstr):
+        cursel_headword = listbox.curselection()
+        if cursel_headword == ():
+            return
+        curstr_headword = listbox.get(cursel_headword[0])
+        varstr.set(curstr_headword)
+        logger.info('curselectionstr: %s', curstr_headword)
+
+        if listbox == self.lstHeadwords:
+            rows = self.db.query_to_headwords(curstr_headword)
+            self.lstFindoutmore.show(RowsSource(rows))
+
+            rrows = self.db.query_from_headwords(curstr_headword)
+            self.lstRFindoutmore.show(RowsSource(rrows))
+
+            self.display_level()
+
+        self.display_type()
+
+    def on_treeview_select(self, event):
+        cursel = self.trvHierarchy.selection()
+        if cursel == () or self.trvHierarchy.tag_has('placeholder', cursel[0]):
+            return
+        self.listbox_showall_headwords(self.lstHeadwords, cursel[0])
+
+    def on_treeview_open(self, event):
+        self.load_tree_children(self.trvHierarchy.focus())
+
+    def display_type(self):
+        curstr_headword = self.var_ent_headword.get() 
+        curstr_findoutmore = self.var_ent_findoutmore.get()
+        curstr_rfindoutmore = self.var_ent_rfindoutmore.get()
+
+        if curstr_headword == '' or curstr_findoutmore == '':
+            self.var_opt_type.set('')
+        else:
+            row = self.db.query_type(curstr_headword, curstr_findoutmore)
+            if row == None:
+                self.var_opt_type.set('')
+            else:
+                self.var_opt_type.set(self.OPTION_TYPE_NAMES[row[0]])
+
+        if curstr_rfindoutmore == '' or curstr_headword == '':
+            self.var_opt_rtype.set('')
+        else:
+            rrow = self.db.query_type(curstr_rfindoutmore, curstr_headword)
+            if rrow == None:
+                self.var_opt_rtype.set('')
+            else:
+                self.var_opt_rtype.set(self.OPTION_TYPE_NAMES[rrow[0]])
+
+    def display_level(self):
+        curstr_headword = self.var_ent_headword.get() 
+
+        row = self.db.query_level(curstr_headword)
+        if row == None:
+            self.var_opt_level.set('')
+        else:
+            # auto-levelling sets depths beyond the named levels, shown as numbers
+            names = dict((level, name) for (name, level) in self.OPTION_LEVEL_LIST.items())
+            self.var_opt_level.set(names.get(row[0], str(row[0])))
+
+    def commit_findoutmore_modification(self, var_from, var_to, var_type):
+        if (var_type.get() == ''):
+            return
+        from_name = var_from.get()
+        to_name = var_to.get()
+        type_id = self.OPTION_TYPE_LIST[var_type.get()]
+        logger.info('%s -> %s : %s', from_name, to_name, type_id)
+
+        try:
+            with self.journal.edit():
+                self.db.save_findoutmore(from_name, to_name, type_id)
+        except CycleError as e: # the edit has been undone
+            logger.warning('%s', e)
+            messagebox.showwarning('Cycle', 'Not changed, this would close a cycle:\n%s' % ' -> '.join(e.cycle))
+            self.display_type()
+            return
+
+        self.refresh_hierarchy([('insert_findoutmore', (from_name, to_name))])
+
+    def update_headword_level(self):
+        if (self.var_opt_level.get() == ''):
+            return
+        headword = self.var_ent_headword.get()
+        level = self.OPTION_LEVEL_LIST.get(self.var_opt_level.get())
+        if level is None:
+            level = int(self.var_opt_level.get())
+        logger.info('%s : %s', headword, level)
+        with self.journal.edit():
+            self.db.update_level(headword, level)
+
+        self.refresh_hierarchy([('update_level', (headword, level))])
+
+    def show_paths(self):
+        """Show the shortest chains from the headword to the findoutmore entry, over edges of the chosen type."""
+        from_name = self.var_ent_headword.get()
+        to_name = self.var_ent_findoutmore.get()
+        if from_name == '' or to_name == '':
+            return
+        type_ids = None
+        if self.var_opt_type.get() != '':
+            type_ids = (self.OPTION_TYPE_LIST[self.var_opt_type.get()],)
+        paths = self.db.query_paths(from_name, to_name, type_ids, self.PATH_COUNT)
+        logger.info('%s -> %s : %s paths', from_name, to_name, len(paths))
+        if not paths:
+            messagebox.showinfo('Path', 'No path from %s to %s' % (from_name, to_name))
+            return
+        window = tk.Toplevel(self)
+        window.title('%s -> %s' % (from_name, to_name))
+        listbox = tk.Listbox(window, width=100, height=len(paths))
+        listbox.pack(fill=tk.BOTH, expand=True)
+        for path in paths:
+            listbox.insert(tk.END, ' -> '.join(path))
+
+    def show_levels(self):
+        """Preview the levels set from the SubClass depths, with the orphans and conflicts, and apply them."""
+        (changes, orphans, conflicts) = plan_levels(self.db)
+        logger.info('levels: %s to change, %s orphans, %s conflicts', len(changes), len(orphans), len(conflicts))
+        window = tk.Toplevel(self)
+        window.title('Levels: %s to change, %s orphans, %s conflicts' % (len(changes), len(orphans), len(conflicts)))
+        listbox = tk.Listbox(window, width=100, height=20)
+        listbox.pack(fill=tk.BOTH, expand=True)
+        for (headword, old_level, new_level) in changes:
+            listbox.insert(tk.END, '%s: %s -> %s' % (headword, old_level, new_level))
+        for (headword, problem, parents) in conflicts:
+            listbox.insert(tk.END, '%s: %s conflict, %s' % (headword, problem, ', '.join(parents)))
+        for headword in orphans:
+            listbox.insert(tk.END, '%s: orphan' % headword)
+
+        def on_buttoncommand_btnApply():
+            rows = tuple((headword, new_level) for (headword, old_level, new_level) in changes)
+            with self.journal.edit():
+                self.db.update_levels(rows)
+            self.db.db_save()   # the batch is one executemany, which the journal does not queue
+            window.destroy()
+            self.refresh_hierarchy([('update_levels', (rows,))])
+            self.display_level()
+        button = tk.Button(window, text='Apply', command=on_buttoncommand_btnApply,
+            state=tk.NORMAL if changes else tk.DISABLED)
+        button.pack()
+
+    def refresh_hierarchy(self, ops):
+        """Bring the hierarchy tree up to date after the (op, args) writes of an edit."""
+        roots_changed = False
+        headwords = set()
+        for (op, args) in ops:
+            if op == 'update_level':
+                self.hierarchy.set_level(args[0], args[1])
+                roots_changed = True
+            elif op == 'update_levels':
+                for (headword, level) in args[0]:
+                    self.hierarchy.set_level(headword, level)
+                roots_changed = True
+            elif op == 'remove_findoutmore_by_fromname_typeid':
+                headwords.add(args[0])
+            else:
+                headwords.update(args[:2])
+        for headword in headwords:
+            for parent in self.hierarchy.load_parents(self.db, headword):
+                self.invalidate_tree_node(parent)
+        if roots_changed:
+            self.refresh_tree_roots()
+
+    def save_batch_writes(self, ops):
+        """Commit the writes of an undo or redo that went past the journal queue."""
+        if any(op == 'update_levels' for (op, args) in ops):
+            self.db.db_save()
+
+    def on_undo(self, event):
+        ops = self.journal.undo()
+        self.save_batch_writes(ops)
+        self.refresh_hierarchy(ops)
+        self.display_type()
+        self.display_level()
+
+    def on_redo(self, event):
+        ops = self.journal.redo()
+        self.save_batch_writes(ops)
+        self.refresh_hierarchy(ops)
+        self.display_type()
+        self.display_level()
+
+    def on_toggle_profiler(self, event):
+        """F12 starts profiling; pressing it again stops and writes PROFILE_FILENAME."""
+        if PROFILER.is_enabled():
+            PROFILER.disable()
+            PROFILER.dump(self.PROFILE_FILENAME)
+        else:
+            PROFILER.reset()
+            PROFILER.enable(PROFILER.trace)
+
+    def display_hierarchy(self):
+        """Show the level 0 roots; sub headwords are loaded when a node is opened."""
+        self.trvHierarchy.delete(*self.trvHierarchy.get_children())
+        self.tree_loaded = set()
+
+        self.hierarchy = HeadwordHierarchy()
+        self.hierarchy.load(self.db)
+        for root in self.hierarchy.roots:
+            self.insert_tree_node('', root)
+
+    def insert_tree_node(self, parent, headword, index='end'):
+        """Insert one node, with a placeholder row if it has sub headwords."""
+        if self.trvHierarchy.exists(headword):
+            return
+        self.trvHierarchy.insert(parent, index, iid=headword, text=headword)
+        if headword in self.hierarchy.children:
+            self.trvHierarchy.insert(headword, 'end', text='...', tags=('placeholder',))
+
+    def load_tree_children(self, headword):
+        """Replace the placeholder of an opened node with its sub headwords."""
+        if headword == '' or headword in self.tree_loaded:
+            return
+        self.trvHierarchy.delete(*self.trvHierarchy.get_children(headword))
+        for sub_headword in self.hierarchy.children.get(headword, ()):
+            self.insert_tree_node(headword, sub_headword)
+        self.tree_loaded.add(headword)
+        logger.debug('tree node loaded: %s', headword)
+
+    def unload_tree_children(self, headword):
+        """Drop the loaded sub nodes of a node and forget them in the cache."""
+        items = list(self.trvHierarchy.get_children(headword))
+        self.trvHierarchy.delete(*items)
+        self.tree_loaded.discard(headword)
+        self.tree_loaded.difference_update(
+            item for item in list(self.tree_loaded) if not self.trvHierarchy.exists(item))
+
+    def invalidate_tree_node(self, headword):
+        """Rebuild only the subtree of one node after its SubClass edges changed."""
+        if not self.trvHierarchy.exists(headword):
+            return
+        is_open = self.trvHierarchy.item(headword, 'open') and headword in self.tree_loaded
+        self.unload_tree_children(headword)
+        if headword in self.hierarchy.children:
+            self.trvHierarchy.insert(headword, 'end', text='...', tags=('placeholder',))
+            if is_open:
+                self.load_tree_children(headword)
+
+    def refresh_tree_roots(self):
+        """Insert or remove top level nodes to match the current roots."""
+        roots = set(self.hierarchy.roots)
+        for item in self.trvHierarchy.get_children(''):
+            if item not in roots:
+                self.unload_tree_children(item)
+                self.trvHierarchy.delete(item)
+        for (index, root) in enumerate(self.hierarchy.roots):
+            if self.trvHierarchy.exists(root):
+                if self.trvHierarchy.parent(root) != '' or self.trvHierarchy.index(root) != index:
+                    self.trvHierarchy.move(root, '', index)
+            else:
+                self.insert_tree_node('', root, index)
+
+PROFILER.register(YoesApplication, ['listbox_showall_headwords', 'listbox_showkey_headwords',
+    'listbox_submitkey_headwords', 'listbox_select_item', 'display_type', 'display_level',
+    'commit_findoutmore_modification', 'update_headword_level', 'refresh_hierarchy',
+    'display_hierarchy', 'insert_tree_node', 'load_tree_children', 'unload_tree_children'])
+
@@ -0,0 +1,300 @@
+"""Learning order with as few backward prerequisite edges as possible.
+
+An edge FROM -> TO of a SEQUENCE_TYPE_IDS type wants TO before FROM; with
+mutual references no order satisfies all of them, and finding the order
+with the least total weight of backward edges is the (NP-hard) minimum
+feedback arc set problem. SequenceOptimizer starts from the greedy order of
+Eades, Lin and Smyth, then improves it by local search on a process pool:
+every epoch, each worker searches from the best order so far with its own
+random seed, and the best order found is kept, until the time budget ends.
+
+Local search alternates two passes:
+- sifting: a headword is reinserted at the place among its neighbours that
+  leaves the least weight backward, found by one sweep over its neighbours
+  sorted by position. Positions are floats so that a move changes only the
+  moved headword; they are renumbered after the pass.
+- for every backward edge, swapping its two ends, or moving a short block
+  of headwords from one end to just past the other, if that lowers the cost.
+"""
+
+from __future__ import absolute_import
+
+import time
+import heapq
+import random
+import logging
+import multiprocessing
+
+from .graph import LearningSequence
+
+logger = logging.getLogger(__name__)
+
+class SequenceOptimizer():
+    """Headwords numbered 0..n-1, with the weighted "u before v" edges between them."""
+    WEIGHTS = {1: 1, 2: 2, 3: 1}    # type id -> weight of the edge when it goes backward
+
+    def __init__(self, headword_ids, edges, weights=None):
+        """headword_ids: ids to order; edges: (from id, to id, type id) rows."""
+        weights = self.WEIGHTS if weights is None else weights
+        self.headword_ids = list(headword_ids)
+        self.index = dict((headword_id, i) for (i, headword_id) in enumerate(self.headword_ids))
+        index = self.index
+        self.n = len(self.headword_ids)
+        self.after = [dict() for i in range(self.n)]    # u -> {v: weight} of the v that should follow u
+        self.before = [dict() for i in range(self.n)]   # v -> {u: weight} of the u that should precede v
+        self.loops = 0
+        for (from_id, to_id, type_id) in edges:
+            if type_id not in weights or from_id not in index or to_id not in index:
+                continue
+            (u, v) = (index[to_id], index[from_id])
+            if u == v:
+                self.loops += 1
+                continue
+            self.after[u][v] = self.after[u].get(v, 0) + weights[type_id]
+            self.before[v][u] = self.before[v].get(u, 0) + weights[type_id]
+        self.m = sum(len(after) for after in self.after)
+
+    def greedy_order(self):
+        """Eades-Lin-Smyth: peel sinks to the back and sources to the front, else the most source-like."""
+        out_weight = [sum(after.values()) for after in self.after]
+        in_weight = [sum(before.values()) for before in self.before]
+        out_count = [len(after) for after in self.after]
+        in_count = [len(before) for before in self.before]
+        removed = [False] * self.n
+        sinks = [u for u in range(self.n) if out_count[u] == 0]
+        sources = [u for u in range(self.n) if in_count[u] == 0 and out_count[u] > 0]
+        heap = [(in_weight[u] - out_weight[u], u) for u in range(self.n)]
+        heapq.heapify(heap)
+        front = list()
+        back = list()
+
+        def remove(u):
+            removed[u] = True
+            for (v, weight) in self.after[u].items():
+                if not removed[v]:
+                    in_weight[v] -= weight
+                    in_count[v] -= 1
+                    if in_count[v] == 0:
+                        sources.append(v)
+                    heapq.heappush(heap, (in_weight[v] - out_weight[v], v))
+            for (v, weight) in self.before[u].items():
+                if not removed[v]:
+                    out_weight[v] -= weight
+                    out_count[v] -= 1
+                    if out_count[v] == 0:
+                        sinks.append(v)
+                    heapq.heappush(heap, (in_weight[v] - out_weight[v], v))
+
+        while len(front) + len(back) < self.n:
+            if sinks:
+                u = sinks.pop()
+                if not removed[u]:
+                    back.append(u)
+                    remove(u)
+            elif sources:
+                u = sources.pop()
+                if not removed[u]:
+                    front.append(u)
+                    remove(u)
+            else:
+                (delta, u) = heapq.heappop(heap)
+                if not removed[u] and delta == in_weight[u] - out_weight[u]:
+                    front.append(u)
+                    remove(u)
+        return front + back[::-1]
+
+    def cost(self, order):
+        position = positions(order)
+        return sum(weight for u in range(self.n) for (v, weight) in self.after[u].items() if position[u] > position[v])
+
+    def violations(self, headword_order):
+        """Yield (from id, to id, weight) of every edge an order of headword ids leaves backward."""
+        position = positions([self.index[headword_id] for headword_id in headword_order])
+        for u in range(self.n):
+            for (v, weight) in self.after[u].items():
+                if position[u] > position[v]:
+                    yield (self.headword_ids[v], self.headword_ids[u], weight)
+
+    def optimize(self, budget=60.0, workers=None, epoch=10.0, seed=1):
+        """Return (cost, order of headword ids) of the best order found within budget seconds."""
+        deadline = time.time() + budget
+        order = self.greedy_order()
+        best = (self.cost(order), order)
+        logger.info('greedy order: %s headwords, %s edges, cost %s', self.n, self.m, best[0])
+        if best[0] == 0:
+            return (best[0], [self.headword_ids[u] for u in best[1]])
+        workers = workers or multiprocessing.cpu_count()
+        pool = None
+        if workers > 1:
+            pool = multiprocessing.Pool(workers, init_worker, (self.after, self.before))
+        try:
+            epochs = 0
+            while best[0] > 0:
+                seconds = min(epoch, deadline - time.time())
+                if seconds <= 0:
+                    break
+                tasks = [(best[1], seed + epochs * workers + i, seconds) for i in range(workers)]
+                if pool is None:
+                    init_worker(self.after, self.before)
+                    results = [search_worker(task) for task in tasks]
+                else:
+                    results = pool.map(search_worker, tasks)
+                best = min([best] + results, key=lambda result: result[0])
+                epochs += 1
+                logger.info('epoch %s: cost %s', epochs, best[0])
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return (best[0], [self.headword_ids[u] for u in best[1]])
+
+def positions(order):
+    position = [0] * len(order)
+    for (i, u) in enumerate(order):
+        position[u] = i
+    return position
+
+WORKER_EDGES = None     # (after, before) of the optimizer, set in every pool process
+
+def init_worker(after, before):
+    global WORKER_EDGES
+    WORKER_EDGES = (after, before)
+
+def search_worker(task):
+    (order, seed, seconds) = task
+    return LocalSearch(WORKER_EDGES[0], WORKER_EDGES[1], order, seed).run(seconds)
+
+class LocalSearch():
+    """Improve one order until a deadline; only moves that do not raise the cost are taken."""
+    SIDEWAYS = 0.1          # chance to take a move that leaves the cost unchanged
+    MAX_BLOCK = 4           # headwords moved together by a block move
+    MAX_SPAN = 5000         # positions between the ends of an edge for swaps and block moves
+
+    def __init__(self, after, before, order, seed):
+        self.after = after
+        self.before = before
+        self.n = len(order)
+        self.order = list(order)
+        self.position = positions(order)
+        self.random = random.Random(seed)
+
+    def backward(self):
+        """Return the (u, v) edges with u placed after v."""
+        position = self.position
+        return [(u, v) for u in range(self.n) for v in self.after[u] if position[u] > position[v]]
+
+    def cost(self):
+        position = self.position
+        return sum(weight for u in range(self.n) for (v, weight) in self.after[u].items() if position[u] > position[v])
+
+    def run(self, seconds):
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            edges = self.backward()
+            if not edges:
+                break
+            nodes = list(set(u for edge in edges for u in edge))
+            self.random.shuffle(nodes)
+            self.sift_pass(nodes, deadline)
+            edges = self.backward()
+            self.random.shuffle(edges)
+            self.edge_pass(edges, deadline)
+        return (self.cost(), self.order)
+
+    def sift_pass(self, nodes, deadline):
+        key = [float(i) for i in self.position]
+        for (count, x) in enumerate(nodes):
+            if count % 256 == 0 and time.time() > deadline:
+                break
+            self.sift(x, key)
+        self.order.sort(key=key.__getitem__)
+        self.position = positions(self.order)
+
+    def sift(self, x, key):
+        neighbours = sorted([(key[y], weight, True) for (y, weight) in self.after[x].items()] +
+            [(key[y], weight, False) for (y, weight) in self.before[x].items()])
+        # cost of x placed before all its neighbours: every edge into x is backward
+        cost = sum(weight for (y_key, weight, x_first) in neighbours if not x_first)
+        best_cost = None
+        best_gaps = list()
+        current_gap = 0
+        for gap in range(len(neighbours) + 1):
+            if gap > 0:
+                (y_key, weight, x_first) = neighbours[gap - 1]
+                cost += weight if x_first else -weight
+                if y_key < key[x]:
+                    current_gap = gap
+            if best_cost is None or cost < best_cost:
+                (best_cost, best_gaps) = (cost, [gap])
+            elif cost == best_cost:
+                best_gaps.append(gap)
+        if current_gap in best_gaps and (len(best_gaps) == 1 or self.random.random() >= self.SIDEWAYS):
+            return
+        gap = self.random.choice([gap for gap in best_gaps if gap != current_gap])
+        low = neighbours[gap - 1][0] if gap > 0 else neighbours[0][0] - 1.0
+        high = neighbours[gap][0] if gap < len(neighbours) else neighbours[-1][0] + 1.0
+        new_key = low + (high - low) * self.random.uniform(0.25, 0.75)
+        if low < new_key < high:
+            key[x] = new_key
+
+    def edge_pass(self, edges, deadline):
+        for (count, (u, v)) in enumerate(edges):
+            if count % 256 == 0 and time.time() > deadline:
+                break
+            (i, j) = (self.position[v], self.position[u])
+            if j <= i or j - i > self.MAX_SPAN:
+                continue
+            k = self.random.randint(1, min(self.MAX_BLOCK, j - i))
+            moves = [(self.swap_delta(i, j), self.swap, (i, j)),
+                (self.move_right_delta(i, k, j), self.move_right, (i, k, j)),
+                (self.move_left_delta(j, k, i), self.move_left, (j, k, i))]
+            (delta, move, args) = min(moves, key=lambda item: item[0])
+            if delta < 0 or (delta == 0 and self.random.random() < self.SIDEWAYS):
+                move(*args)
+
+    def flips(self, x, low, high):
+        """Return the weight change when x passes every headword placed in [low, high], x ending after them."""
+        position = self.position
+        delta = 0
+        for (y, weight) in self.after[x].items():
+            if low <= position[y] <= high:
+                delta += weight
+        for (y, weight) in self.before[x].items():
+            if low <= position[y] <= high:
+                delta -= weight
+        return delta
+
+    def swap_delta(self, i, j):
+        (a, b) = (self.order[i], self.order[j])
+        delta = self.flips(a, i + 1, j - 1) - self.flips(b, i + 1, j - 1)
+        return delta + self.after[a].get(b, 0) - self.after[b].get(a, 0)
+
+    def swap(self, i, j):
+        (a, b) = (self.order[i], self.order[j])
+        (self.order[i], self.order[j]) = (b, a)
+        (self.position[a], self.position[b]) = (j, i)
+
+    def move_right_delta(self, i, k, j):
+        """Cost change of moving the block order[i:i + k] to just after order[j]."""
+        return sum(self.flips(x, i + k, j) for x in self.order[i:i + k])
+
+    def move_right(self, i, k, j):
+        self.order[i:j + 1] = self.order[i + k:j + 1] + self.order[i:i + k]
+        for p in range(i, j + 1):
+            self.position[self.order[p]] = p
+
+    def move_left_delta(self, j, k, i):
+        """Cost change of moving the block order[j - k + 1:j + 1] to just before order[i]."""
+        return -sum(self.flips(x, i, j - k) for x in self.order[j - k + 1:j + 1])
+
+    def move_left(self, j, k, i):
+        self.order[i:j + 1] = self.order[j - k + 1:j + 1] + self.order[i:j - k + 1]
+        for p in range(i, j + 1):
+            self.position[self.order[p]] = p
+
+def load_optimizer(db, weights=None):
+    """Return a SequenceOptimizer over all headwords and findoutmore rows of a DbStorage."""
+    weights = SequenceOptimizer.WEIGHTS if weights is None else weights
+    headword_ids = sorted(row[0] for row in db.query_all_headwords())
+    edges = [row for row in db.query_all_findoutmore() if row[2] in LearningSequence.SEQUENCE_TYPE_IDS]
+    return SequenceOptimizer(headword_ids, edges, weights)
@@ -0,0 +1,104 @@
+"""Per-method call counts, latencies and rows, switched on and off at runtime."""
+
+from __future__ import absolute_import
+
+import json
+import time
+import logging
+import threading
+import functools
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CLOCK = getattr(time, 'perf_counter', time.time)
+
+class Profiler():
+    """Call counts, latency histograms and returned rows per method, switchable at runtime.
+
+    enable() replaces the registered methods with timing wrappers and
+    disable() puts the originals back, so a disabled profiler costs nothing.
+    With trace on, the wrappers also log ENTER/LEAVE of every call at DEBUG.
+    """
+    def __init__(self):
+        self.methods = list()       # [(class, method name)] to wrap when enabled
+        self.originals = dict()     # (class, method name) -> unwrapped function
+        self.stats = dict()         # 'Class.method' -> [calls, seconds, max seconds, rows, {bucket: calls}]
+        self.trace = False
+        self.lock = threading.Lock()
+
+    def register(self, cls, names):
+        self.methods.extend((cls, name) for name in names)
+        if self.is_enabled():
+            self.enable(self.trace)  # classes of modules imported while profiling
+
+    def is_enabled(self):
+        return bool(self.originals)
+
+    def enable(self, trace=False):
+        self.trace = trace
+        for (cls, name) in self.methods:
+            if (cls, name) not in self.originals:
+                function = cls.__dict__[name]
+                self.originals[(cls, name)] = function
+                setattr(cls, name, self.wrap('%s.%s' % (cls.__name__, name), function))
+        logger.info('profiler enabled: %s methods', len(self.originals))
+
+    def disable(self):
+        for ((cls, name), function) in self.originals.items():
+            setattr(cls, name, function)
+        self.originals = dict()
+        logger.info('profiler disabled')
+
+    def reset(self):
+        with self.lock:
+            self.stats = dict()
+
+    def wrap(self, qualname, function):
+        profiler = self
+        @functools.wraps(function)
+        def profiled(*args, **kwargs):
+            if profiler.trace:
+                logger.debug('ENTER %s%r', qualname, args[1:])
+            result = None
+            start = PROFILE_CLOCK()
+            try:
+                result = function(*args, **kwargs)
+                return result
+            finally:
+                elapsed = PROFILE_CLOCK() - start
+                profiler.record(qualname, elapsed, result)
+                if profiler.trace:
+                    logger.debug('LEAVE %s %.3f ms', qualname, elapsed * 1000)
+        return profiled
+
+    def record(self, qualname, elapsed, result):
+        """Count one call; list results count their length as rows, others one row unless None."""
+        rows = len(result) if isinstance(result, list) else int(result is not None)
+        bucket = 1 << int(elapsed * 1000000).bit_length()   # upper bound in microseconds
+        with self.lock:
+            stats = self.stats.get(qualname)
+            if stats is None:
+                stats = self.stats[qualname] = [0, 0.0, 0.0, 0, dict()]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            stats[3] += rows
+            stats[4][bucket] = stats[4].get(bucket, 0) + 1
+
+    def report(self):
+        """Return the statistics as a JSON-ready dict keyed by 'Class.method'.
+
+        histogram_us lists [upper bound in microseconds, calls] for power of two buckets.
+        """
+        with self.lock:
+            return dict((qualname, dict(calls=calls, total_ms=seconds * 1000, max_ms=max_seconds * 1000,
+                    mean_ms=seconds * 1000 / calls, rows=rows,
+                    histogram_us=sorted(histogram.items())))
+                for (qualname, (calls, seconds, max_seconds, rows, histogram)) in self.stats.items())
+
+    def dump(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=1, sort_keys=True)
+        logger.info('profile written: %s', filename)
+
+PROFILER = Profiler()
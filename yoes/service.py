@@ -0,0 +1,340 @@
+"""Headless HTTP/JSON service over yoes.db for many local clients; Python 3 only.
+
+Every request is answered on one asyncio event loop from a HeadwordGraph and
+HeadwordIndex shared by all clients, and encoded GET responses are cached
+until the next write. Writes are applied to the graph on the loop, one at a
+time in arrival order, and their SQL goes to a WriteJournal whose thread is
+the only one writing to the database. The service should be the only
+writer of its database while it runs.
+
+    GET    /headwords?key=K&offset=0&limit=100   headwords containing K
+    GET    /from?headword=H                      FROM headwords of the edges to H
+    GET    /to?headword=H                        TO headwords of the edges from H
+    GET    /level?headword=H
+    GET    /type?from=A&to=B
+    GET    /hierarchy[?headword=H]               SubClass parents and subs of H, or the roots
+    GET    /stats                                request, cache and write counters
+    POST   /level         {"headword": H, "level": L}
+    POST   /findoutmore   {"from": A, "to": B, "type": T}    as the editor sets it; 409 if it would close a cycle
+    DELETE /findoutmore?from=A&to=B
+"""
+
+from __future__ import absolute_import
+
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+import collections
+import http.client
+import urllib.parse
+
+from .graph import CycleError
+from .storage import DbStorage, WriteJournal
+
+logger = logging.getLogger(__name__)
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+class QueryService():
+    """The handlers of the service over one DbStorage, independent of the transport."""
+    SUBCLASS_TYPE_ID = 2
+    CACHE_SIZE = 4096
+
+    def __init__(self, db, cache_size=CACHE_SIZE):
+        if db.graph is None:
+            db.load_graph()
+        if db.search_index is None:
+            db.load_search_index()
+        if db.order is None:
+            db.load_order()
+        self.db = db
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()  # GET target -> encoded body, least recently used first
+        self.requests = 0
+        self.cache_hits = 0
+        self.writes = 0
+        self.get_handlers = {'/headwords': self.get_headwords, '/from': self.get_from, '/to': self.get_to,
+            '/level': self.get_level, '/type': self.get_type, '/hierarchy': self.get_hierarchy}
+        self.write_handlers = {('POST', '/level'): self.post_level, ('POST', '/findoutmore'): self.post_findoutmore,
+            ('DELETE', '/findoutmore'): self.delete_findoutmore}
+
+    def handle(self, method, target, body):
+        """Return (status, encoded JSON body) of one request."""
+        self.requests += 1
+        (path, params) = self.split_target(target)
+        try:
+            if method == 'GET':
+                if path == '/stats':
+                    return (200, self.encode(self.get_stats(params)))
+                cached = self.cache.get(target)
+                if cached is not None:
+                    self.cache_hits += 1
+                    self.cache.move_to_end(target)
+                    return (200, cached)
+                handler = self.get_handlers.get(path)
+                if handler is None:
+                    raise HttpError(404, 'no such path: %s' % path)
+                encoded = self.encode(handler(params))
+                self.cache[target] = encoded
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+                return (200, encoded)
+            handler = self.write_handlers.get((method, path))
+            if handler is None:
+                raise HttpError(405 if path in ('/level', '/findoutmore') else 404,
+                    'no such method: %s %s' % (method, path))
+            if body:
+                try:
+                    fields = json.loads(body.decode('utf-8'))
+                except ValueError:
+                    raise HttpError(400, 'body is not JSON')
+                if not isinstance(fields, dict):
+                    raise HttpError(400, 'body is not a JSON object')
+                params.update(fields)
+            result = handler(params)
+            self.writes += 1
+            self.cache.clear()
+            return (200, self.encode(result))
+        except HttpError as e:
+            return (e.status, self.encode(dict(error=str(e))))
+        except CycleError as e:
+            return (409, self.encode(dict(error=str(e), cycle=e.cycle)))
+        except Exception as e:
+            logger.exception('%s %s failed', method, target)
+            return (500, self.encode(dict(error=str(e))))
+
+    def split_target(self, target):
+        parts = urllib.parse.urlsplit(target)
+        return (parts.path, dict(urllib.parse.parse_qsl(parts.query)))
+
+    def encode(self, result):
+        return json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def param(self, params, name):
+        value = params.get(name)
+        if value is None:
+            raise HttpError(400, 'missing parameter: %s' % name)
+        if not isinstance(value, str):
+            raise HttpError(400, 'not a string: %s' % name)
+        return value
+
+    def int_param(self, params, name, default=None):
+        value = params.get(name, default)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise HttpError(400, 'not an integer: %s' % name)
+
+    def headword_param(self, params, name='headword'):
+        headword = self.param(params, name)
+        if headword not in self.db.graph.ids:
+            raise HttpError(404, 'no such headword: %s' % headword)
+        return headword
+
+    def get_headwords(self, params):
+        rows = self.db.query_headwords_bykey(params.get('key'))
+        offset = self.int_param(params, 'offset', 0)
+        limit = self.int_param(params, 'limit', 100)
+        return dict(count=len(rows), headwords=[row[0] for row in rows[offset:offset + limit]])
+
+    def get_from(self, params):
+        return dict(headwords=[row[0] for row in self.db.query_from_headwords(self.headword_param(params))])
+
+    def get_to(self, params):
+        return dict(headwords=[row[0] for row in self.db.query_to_headwords(self.headword_param(params))])
+
+    def get_level(self, params):
+        return dict(level=self.db.query_level(self.headword_param(params))[0])
+
+    def get_type(self, params):
+        row = self.db.query_type(self.headword_param(params, 'from'), self.headword_param(params, 'to'))
+        return dict(type=None if row is None else row[0])
+
+    def get_hierarchy(self, params):
+        graph = self.db.graph
+        if 'headword' not in params:
+            return dict(roots=[row[0] for row in self.db.query_headwords_bylevel(0)])
+        headword_id = graph.ids[self.headword_param(params)]
+        return dict(parents=graph.names(to_id for (to_id, type_id)
+                in graph.query_to_ids(headword_id, self.SUBCLASS_TYPE_ID)),
+            subs=graph.names(from_id for (from_id, type_id)
+                in graph.query_from_ids(headword_id, self.SUBCLASS_TYPE_ID)))
+
+    def get_stats(self, params):
+        return dict(requests=self.requests, cache_hits=self.cache_hits, cached=len(self.cache), writes=self.writes,
+            headwords=len(self.db.graph.ids))
+
+    def post_level(self, params):
+        headword = self.headword_param(params)
+        level = self.int_param(params, 'level')
+        self.db.update_level(headword, level)
+        return dict(headword=headword, level=level)
+
+    def post_findoutmore(self, params):
+        from_name = self.headword_param(params, 'from')
+        to_name = self.headword_param(params, 'to')
+        type_id = self.int_param(params, 'type')
+        if type_id not in DbStorage.TYPE_IDS:
+            raise HttpError(400, 'no such type: %s' % type_id)
+        (from_name, to_name, type_id) = self.db.save_findoutmore(from_name, to_name, type_id)
+        return {'from': from_name, 'to': to_name, 'type': type_id}
+
+    def delete_findoutmore(self, params):
+        from_name = self.headword_param(params, 'from')
+        to_name = self.headword_param(params, 'to')
+        self.db.remove_findoutmore(from_name, to_name)
+        return {'from': from_name, 'to': to_name, 'type': None}
+
+class HttpProtocol(asyncio.Protocol):
+    """HTTP/1.1 with keep-alive and pipelining, answering each request as soon as it is complete."""
+    MAX_HEADER_SIZE = 64 * 1024
+    MAX_BODY_SIZE = 1024 * 1024
+    REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict',
+        413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+    def __init__(self, service):
+        self.service = service
+        self.transport = None
+        self.buffer = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer += data
+        while self.transport is not None:
+            end = self.buffer.find(b'\r\n\r\n')
+            if end < 0:
+                if len(self.buffer) > self.MAX_HEADER_SIZE:
+                    self.respond(413, b'{"error":"header too large"}', False)
+                return
+            lines = self.buffer[:end].decode('latin-1').split('\r\n')
+            try:
+                (method, target, version) = lines[0].split(' ')
+                headers = dict((name.strip().lower(), value.strip())
+                    for (name, value) in (line.split(':', 1) for line in lines[1:]))
+                length = int(headers.get('content-length', 0))
+            except ValueError:
+                self.respond(400, b'{"error":"bad request"}', False)
+                return
+            if length > self.MAX_BODY_SIZE:
+                self.respond(413, b'{"error":"body too large"}', False)
+                return
+            if len(self.buffer) < end + 4 + length:
+                return
+            body = self.buffer[end + 4:end + 4 + length]
+            self.buffer = self.buffer[end + 4 + length:]
+            connection = headers.get('connection', '').lower()
+            keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+            (status, encoded) = self.service.handle(method, target, body)
+            self.respond(status, encoded, keep_alive)
+
+    def respond(self, status, encoded, keep_alive):
+        self.transport.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=utf-8\r\n'
+            'Content-Length: %d\r\nConnection: %s\r\n\r\n' % (status, self.REASONS[status], len(encoded),
+            'keep-alive' if keep_alive else 'close')).encode('latin-1') + encoded)
+        if not keep_alive:
+            self.transport.close()
+            self.transport = None
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+def serve(dbname, host='127.0.0.1', port=8080):
+    """Run the service until interrupted."""
+    db = DbStorage()
+    db.db_open(dbname)
+    journal = WriteJournal(db)
+    service = QueryService(db)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(loop.create_server(lambda: HttpProtocol(service), host, port))
+    logger.info('serving %s on http://%s:%s', dbname, host, port)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+        journal.close()
+        db.db_close()
+        logger.info('service stopped after %s requests, %s writes', service.requests, service.writes)
+
+class LoadTest():
+    """Local load test: clients threads, each on one keep-alive connection, timing every request."""
+    def __init__(self, host='127.0.0.1', port=8080, clients=20, requests=500, writes=0.0, seed=1):
+        self.host = host
+        self.port = port
+        self.clients = clients
+        self.requests = requests
+        self.writes = writes
+        self.seed = seed
+        self.headwords = list()
+        self.latencies = list()     # seconds of every request
+        self.errors = collections.Counter()     # status -> count of the responses other than 200
+        self.lock = threading.Lock()
+
+    def request(self, connection, method, target, body=None):
+        connection.request(method, target, body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        return (response.status, json.loads(response.read().decode('utf-8')))
+
+    def target(self, path, **params):
+        return '%s?%s' % (path, urllib.parse.urlencode(params))
+
+    def run_client(self, index):
+        rand = random.Random(self.seed + index)
+        connection = http.client.HTTPConnection(self.host, self.port)
+        latencies = list()
+        errors = collections.Counter()
+        for i in range(self.requests):
+            headword = rand.choice(self.headwords)
+            x = rand.random()
+            started = time.time()
+            if x < self.writes:
+                (status, result) = self.request(connection, 'GET', self.target('/level', headword=headword))
+                if status == 200:
+                    (status, result) = self.request(connection, 'POST', '/level',
+                        json.dumps(dict(headword=headword, level=result['level'])))
+            elif x < 0.5:
+                start = rand.randrange(len(headword))
+                (status, result) = self.request(connection, 'GET',
+                    self.target('/headwords', key=headword[start:start + rand.randint(1, 4)], limit=50))
+            else:
+                path = rand.choice(['/from', '/to', '/level', '/hierarchy'])
+                (status, result) = self.request(connection, 'GET', self.target(path, headword=headword))
+            latencies.append(time.time() - started)
+            if status != 200:
+                errors[status] += 1
+        connection.close()
+        with self.lock:
+            self.latencies.extend(latencies)
+            self.errors.update(errors)
+
+    def run(self):
+        """Run every client at once; return a summary dict."""
+        connection = http.client.HTTPConnection(self.host, self.port)
+        (status, result) = self.request(connection, 'GET', self.target('/headwords', limit=1 << 30))
+        connection.close()
+        self.headwords = result['headwords']
+        threads = [threading.Thread(target=self.run_client, args=(i,)) for i in range(self.clients)]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.time() - started
+        latencies = sorted(self.latencies)
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else None
+        return dict(clients=self.clients, requests=len(latencies), seconds=seconds,
+            requests_per_second=len(latencies) / seconds if seconds > 0 else 0.0,
+            p50_ms=percentile(0.5), p95_ms=percentile(0.95), p99_ms=percentile(0.99),
+            errors=dict((str(k), v) for (k, v) in self.errors.items()))
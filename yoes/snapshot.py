@@ -0,0 +1,212 @@
+"""Compact, memory-mapped snapshot of HEADWORDS/FINDOUTMORE for fast start-up.
+
+Headwords are numbered 0..n-1 in HEADWORD order. Both edge directions are
+stored as CSR adjacency: int32 offsets[n + 1] and targets[m], with uint8
+types[m] beside them, and the headwords as one UTF-8 string table. The
+file is mapped with mmap and the arrays are views of the mapping (NumPy
+when it is installed, memoryview otherwise), so loading copies nothing.
+
+A snapshot records META.generation of the database it was written from;
+GraphSnapshot.open() rewrites it when the database has changed since.
+"""
+
+from __future__ import absolute_import
+
+import os
+import sys
+import mmap
+import array
+import struct
+import shutil
+import logging
+import sqlite3
+import tempfile
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'YOESCSR1'
+ENDIAN_MARK = 0x01020304
+HEADER = struct.Struct('=8sIqIII')  # magic, endian mark, generation, headwords, edges, string table size
+
+def query_generation(connection):
+    """Return META.generation of a sqlite3 connection, or None before schema version 3."""
+    try:
+        return connection.execute('''SELECT VALUE FROM META WHERE KEY = 'generation';''').fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+def int32_array(values=()):
+    return array.array('i', values)
+
+def array_bytes(values):
+    return values.tobytes() if hasattr(values, 'tobytes') else values.tostring()
+
+def csr(count, edges):
+    """Return (offsets, targets, types) arrays of the (from, to, type) edges grouped by from."""
+    offsets = int32_array([0]) * (count + 1)
+    for (from_i, to_i, type_id) in edges:
+        offsets[from_i + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+    fill = int32_array(offsets)
+    targets = int32_array([0]) * len(edges)
+    types = array.array('B', [0]) * len(edges)
+    for (from_i, to_i, type_id) in sorted(edges):
+        targets[fill[from_i]] = to_i
+        types[fill[from_i]] = type_id
+        fill[from_i] += 1
+    return (offsets, targets, types)
+
+def keep_mode(temp_filename, filename):
+    """Give the file replacing filename its mode, or that of a new file, not the 0600 of mkstemp()."""
+    if os.path.exists(filename):
+        shutil.copymode(filename, temp_filename)
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_filename, 0o666 & ~umask)
+
+def write_snapshot(connection, filename):
+    """Write a snapshot of the database behind a sqlite3 connection; return its generation.
+
+    Everything is read in one transaction, and the file is replaced atomically.
+    """
+    in_transaction = connection.in_transaction if hasattr(connection, 'in_transaction') else False
+    if not in_transaction:
+        connection.execute('BEGIN;')
+    try:
+        generation = query_generation(connection)
+        # ROWID is ID from schema version 2 on, and the only id before it, when LEVEL may be missing too
+        columns = [row[1] for row in connection.execute('PRAGMA table_info(HEADWORDS);')]
+        level = 'LEVEL' if 'LEVEL' in columns else '-1'
+        rows = connection.execute('''SELECT ROWID, HEADWORD, COALESCE(%s, -1) FROM HEADWORDS
+            ORDER BY HEADWORD ASC;''' % level).fetchall()
+        index = dict((headword_id, i) for (i, (headword_id, headword, level)) in enumerate(rows))
+        edges = [(index[from_id], index[to_id], type_id) for (from_id, to_id, type_id)
+            in connection.execute('''SELECT FROM_ID, TO_ID, COALESCE(TYPE_ID, 0) FROM FINDOUTMORE;''')
+            if from_id in index and to_id in index]
+    finally:
+        if not in_transaction:
+            connection.rollback()
+
+    names = [headword.encode('utf-8') for (headword_id, headword, level) in rows]
+    name_offsets = int32_array([0])
+    for name in names:
+        name_offsets.append(name_offsets[-1] + len(name))
+    string_table = b''.join(names)
+    (to_offsets, to_targets, to_types) = csr(len(rows), edges)
+    (from_offsets, from_targets, from_types) = csr(len(rows), [(to_i, from_i, type_id) for (from_i, to_i, type_id) in edges])
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    (fd, temp_filename) = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, ENDIAN_MARK, -1 if generation is None else generation,
+                len(rows), len(edges), len(string_table)))
+            for values in (int32_array(row[0] for row in rows), int32_array(row[2] for row in rows), name_offsets,
+                    to_offsets, to_targets, from_offsets, from_targets, to_types, from_types):
+                f.write(array_bytes(values))
+            f.write(string_table)
+        keep_mode(temp_filename, filename)
+        if os.path.exists(filename) and sys.platform.startswith('win'):
+            os.remove(filename)
+        os.rename(temp_filename, filename)
+    except Exception:
+        os.remove(temp_filename)
+        raise
+    logger.info('snapshot written: %s, %s headwords, %s edges, generation %s', filename, len(rows), len(edges), generation)
+    return generation
+
+class GraphSnapshot():
+    """Read-only view of a snapshot file; headwords are addressed by their index."""
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, endian_mark, self.generation, self.n, self.m, string_size) = HEADER.unpack_from(self.mapping, 0)
+        if magic != MAGIC or endian_mark != ENDIAN_MARK:
+            self.mapping.close()
+            raise ValueError('not a snapshot of this platform: %s' % filename)
+        n = self.n
+        m = self.m
+        offset = HEADER.size
+        sections = list()
+        for (typecode, count) in (('i', n), ('i', n), ('i', n + 1), ('i', n + 1), ('i', m), ('i', n + 1), ('i', m),
+                ('B', m), ('B', m)):
+            sections.append(self.view(typecode, offset, count))
+            offset += count * (4 if typecode == 'i' else 1)
+        (self.ids, self.levels, self.name_offsets, self.to_offsets, self.to_targets,
+            self.from_offsets, self.from_targets, self.to_types, self.from_types) = sections
+        self.string_offset = offset
+        self.names = [None] * n     # decoded headwords, each decoded once
+
+    def view(self, typecode, offset, count):
+        if numpy is not None:
+            return numpy.frombuffer(self.mapping, numpy.int32 if typecode == 'i' else numpy.uint8, count, offset)
+        if hasattr(memoryview, 'cast'):
+            return memoryview(self.mapping)[offset:offset + count * (4 if typecode == 'i' else 1)].cast(typecode)
+        values = array.array(typecode)  # Python2 has no memoryview.cast: copy instead
+        values.fromstring(self.mapping[offset:offset + count * values.itemsize])
+        return values
+
+    @classmethod
+    def open(cls, connection, filename):
+        """Load filename, writing it first if it is missing or older than the database."""
+        generation = query_generation(connection)
+        if generation is not None and os.path.exists(filename):
+            try:
+                snapshot = cls(filename)
+            except (ValueError, struct.error, mmap.error):
+                snapshot = None
+            if snapshot is not None and snapshot.generation == generation:
+                return snapshot
+            if snapshot is not None:
+                snapshot.close()
+        write_snapshot(connection, filename)
+        return cls(filename)
+
+    def close(self):
+        self.ids = self.levels = self.name_offsets = self.to_offsets = self.to_targets = None
+        self.from_offsets = self.from_targets = self.to_types = self.from_types = None
+        self.mapping.close()
+
+    def headword(self, i):
+        name = self.names[i]
+        if name is None:
+            start = self.string_offset + int(self.name_offsets[i])
+            name = self.mapping[start:self.string_offset + int(self.name_offsets[i + 1])].decode('utf-8')
+            self.names[i] = name
+        return name
+
+    def index(self, headword):
+        """Return the index of a headword, or None."""
+        (low, high) = (0, self.n)
+        while low < high:
+            middle = (low + high) // 2
+            if self.headword(middle) < headword:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n and self.headword(low) == headword:
+            return low
+        return None
+
+    def to_edges(self, i):
+        """Return [(to index, type id)] of the edges from headword i."""
+        (start, end) = (int(self.to_offsets[i]), int(self.to_offsets[i + 1]))
+        return list(zip((int(j) for j in self.to_targets[start:end]), (int(t) for t in self.to_types[start:end])))
+
+    def from_edges(self, i):
+        """Return [(from index, type id)] of the edges to headword i."""
+        (start, end) = (int(self.from_offsets[i]), int(self.from_offsets[i + 1]))
+        return list(zip((int(j) for j in self.from_targets[start:end]), (int(t) for t in self.from_types[start:end])))
+
+    def edges(self, type_ids=None):
+        """Yield (from index, to index, type id) of every edge, or of the given types."""
+        for i in range(self.n):
+            for (j, type_id) in self.to_edges(i):
+                if type_ids is None or type_id in type_ids:
+                    yield (i, j, type_id)
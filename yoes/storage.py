@@ -0,0 +1,1087 @@
+"""yoes.db access and the bulk import of headwords.txt/findoutmore.txt."""
+
+from __future__ import absolute_import
+
+import re
+import io
+import time
+import bisect
+import logging
+import sqlite3
+import itertools
+import threading
+import contextlib
+try:
+    import Queue as queue   # Python2
+except ImportError:
+    import queue
+
+from .graph import HeadwordGraph, HeadwordHierarchy, HeadwordIndex, LearningSequence, PrerequisiteClosure, TopologicalOrder, CycleError, \
+    k_shortest_paths
+from .profile import PROFILER
+from .duplicates import NearDuplicateIndex
+
+logger = logging.getLogger(__name__)
+
+class DbStorage():
+    """Access to yoes.db: one writer connection and a pool of read-only connections.
+
+    The database is put in WAL mode, so readers in this and other processes
+    do not wait for the writer. Until db_save() commits, reads go to the
+    writer connection so that uncommitted edits are seen. With a WriteJournal
+    attached, editor writes are queued and committed in batches instead.
+    """
+    TYPE_IDS = (0, 1, 2, 3)     # Undefined, Depends, SubClass, RDepends
+    SUBCLASS_TYPE_ID = 2
+    RDEPENDS_TYPE_ID = 3
+
+    def __init__(self, readers=2, cached_statements=256, synchronous='NORMAL',
+            mmap_size=256 * 1024 * 1024, cache_size=-16 * 1024):
+        self.graph = None
+        self.search_index = None
+        self.closure = None
+        self.order = None
+        self.journal = None
+        self.readers = readers
+        self.cached_statements = cached_statements
+        self.pragmas = [('synchronous', synchronous), ('mmap_size', mmap_size), ('cache_size', cache_size)]
+        self.__lock = threading.RLock()
+        self.__readers = None
+        self.__pool_size = 0
+        self.__dirty = False
+        self.__lent = dict()        # thread ident -> pooled reader it is using
+        self.__lent_lock = threading.Lock()
+
+    def connect(self, dbname):
+        db = sqlite3.connect(dbname, cached_statements=self.cached_statements, check_same_thread=False)
+        for (name, value) in self.pragmas:
+            db.execute('PRAGMA %s = %s;' % (name, value))
+        return db
+
+    def db_open(self, dbname):
+        self.__db = self.connect(dbname)
+        if dbname != ':memory:':
+            self.__db.execute('PRAGMA journal_mode = WAL;')
+        self.upgrade_schema()
+        self.__readers = queue.Queue()
+        self.__pool_size = self.readers if dbname != ':memory:' else 0
+        for i in range(self.__pool_size):
+            reader = self.connect(dbname)
+            reader.execute('PRAGMA query_only = 1;')
+            self.__readers.put(reader)
+        logger.info('db opened: %s', dbname)
+
+    def db_save(self):
+        if self.journal is not None:
+            self.journal.flush()
+        with self.__lock:
+            self.__db.commit()
+            self.__dirty = False
+        logger.debug('db saved')
+
+    def commit(self):
+        """Commit the writes made on the writer connection, if there are any."""
+        with self.__lock:
+            if self.__dirty:
+                self.__db.commit()
+                self.__dirty = False
+
+    def db_close(self):
+        while self.__readers is not None and not self.__readers.empty():
+            self.__readers.get().close()
+        self.__db.close()
+        logger.info('db closed')
+
+    @contextlib.contextmanager
+    def reader(self):
+        """Lend a read-only connection, or the writer while it has uncommitted changes."""
+        if self.__dirty or self.__pool_size == 0:
+            with self.__lock:
+                yield self.__db
+            return
+        db = self.__readers.get()
+        ident = threading.current_thread().ident
+        with self.__lent_lock:
+            self.__lent[ident] = db
+        try:
+            yield db
+        finally:
+            with self.__lent_lock:
+                del self.__lent[ident]
+            self.__readers.put(db)
+
+    def interrupt(self, ident):
+        """Abort the query a thread is running on a pooled reader; the writer is never interrupted."""
+        with self.__lent_lock:
+            db = self.__lent.get(ident)
+            if db is not None:
+                db.interrupt()
+
+    def read(self, sql, parameters=()):
+        with self.reader() as db:
+            return db.execute(sql, parameters).fetchall()
+
+    def read_one(self, sql, parameters=()):
+        with self.reader() as db:
+            return db.execute(sql, parameters).fetchone()
+
+    def write(self, sql, parameters=(), deferrable=False):
+        """Execute one write; a deferrable one is queued on the journal if there is one."""
+        if self.journal is not None:
+            if deferrable:
+                self.journal.queue(sql, parameters)
+                return None
+            self.journal.flush()
+        with self.__lock:
+            self.__dirty = True
+            cursor = self.__db.execute(sql, parameters)
+            self.__db.execute(self.BUMP_GENERATION_SQL)
+            return cursor
+
+    def write_many(self, sql, rows):
+        if self.journal is not None:
+            self.journal.flush()
+        with self.__lock:
+            self.__dirty = True
+            cursor = self.__db.executemany(sql, rows)
+            self.__db.execute(self.BUMP_GENERATION_SQL)
+            return cursor
+
+    def write_batch(self, statements):
+        """Execute and commit [(sql, parameters)] as one transaction, or roll all of them back."""
+        with self.__lock:
+            try:
+                for (sql, parameters) in statements:
+                    self.__db.execute(sql, parameters)
+                self.__db.execute(self.BUMP_GENERATION_SQL)
+                self.__db.commit()
+            except sqlite3.Error:
+                self.__db.rollback()
+                raise
+            finally:
+                self.__dirty = False
+
+    SCHEMA_VERSION = 4
+    # FINDOUTMORE has no rowid, so both of its indexes also carry the other id and cover the lookups.
+    # META.generation is bumped by every write of this class (per statement, not per row, which
+    # triggers would cost on bulk imports), so that caches such as GraphSnapshot can tell they are stale.
+    # SYNC_CHUNKS holds the chunks of the text files as of the last TxtfileSync, and META.synced the
+    # generation the database had then.
+    SCHEMA_SQL = '''CREATE TABLE IF NOT EXISTS HEADWORDS(
+            ID          INTEGER     PRIMARY KEY,
+            HEADWORD    TEXT        NOT NULL UNIQUE,
+            LEVEL       INTEGER     NOT NULL DEFAULT(-1)
+            );
+        CREATE TABLE IF NOT EXISTS FINDOUTMORE(
+            FROM_ID     INTEGER     NOT NULL,
+            TO_ID       INTEGER     NOT NULL,
+            TYPE_ID     INTEGER     NOT NULL DEFAULT(0),
+            PRIMARY KEY(FROM_ID, TO_ID)
+            ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS FINDOUTMORE_TO_TYPE ON FINDOUTMORE(TO_ID, TYPE_ID);
+        CREATE INDEX IF NOT EXISTS FINDOUTMORE_FROM_TYPE ON FINDOUTMORE(FROM_ID, TYPE_ID);
+        CREATE VIEW IF NOT EXISTS V_FINDOUTMORE(FROM_HEADWORD, TO_HEADWORD, TYPE_ID)
+            AS SELECT H1.HEADWORD, H2.HEADWORD, FINDOUTMORE.TYPE_ID FROM HEADWORDS H1, FINDOUTMORE, HEADWORDS H2
+            WHERE H1.ID = FINDOUTMORE.FROM_ID AND H2.ID = FINDOUTMORE.TO_ID;
+        CREATE TABLE IF NOT EXISTS SEQUENCE(
+            HEADWORD_ID INTEGER     PRIMARY KEY,
+            RANK        INTEGER     NOT NULL
+            );
+        CREATE TABLE IF NOT EXISTS META(
+            KEY         TEXT        PRIMARY KEY,
+            VALUE       INTEGER     NOT NULL
+            ) WITHOUT ROWID;
+        INSERT OR IGNORE INTO META(KEY, VALUE) VALUES('generation', 0);
+        CREATE TABLE IF NOT EXISTS SYNC_CHUNKS(
+            FILE        TEXT        NOT NULL,
+            HASH        TEXT        NOT NULL,
+            COUNT       INTEGER     NOT NULL,
+            ROWS        TEXT        NOT NULL,
+            PRIMARY KEY(FILE, HASH)
+            ) WITHOUT ROWID;
+        PRAGMA user_version = 4;'''
+    BUMP_GENERATION_SQL = '''UPDATE META SET VALUE = VALUE + 1 WHERE KEY = 'generation';'''
+
+    def create_tables(self):
+        self.__db.executescript(self.SCHEMA_SQL)
+        logger.info('CREATE TABLE HEADWORDS, FINDOUTMORE, SEQUENCE, META, SYNC_CHUNKS, VIEW V_FINDOUTMORE')
+
+    def upgrade_schema(self):
+        """Create or migrate the tables in place up to SCHEMA_VERSION, tracked by PRAGMA user_version."""
+        version = self.__db.execute('PRAGMA user_version;').fetchone()[0]
+        tables = [row[0] for row in self.__db.execute('''SELECT NAME FROM SQLITE_MASTER WHERE TYPE = 'table';''')]
+        if 'HEADWORDS' not in tables:
+            self.create_tables()
+        elif version < 2:
+            self.migrate_schema_v2()
+        elif version < self.SCHEMA_VERSION:
+            self.create_tables()    # versions 3 and 4 only add META and SYNC_CHUNKS
+            logger.info('schema migrated to version %s', self.SCHEMA_VERSION)
+
+    def migrate_schema_v2(self):
+        """Rebuild the version 1 tables with an explicit ID, real LEVEL/TYPE_ID columns and indexes.
+
+        Old ROWIDs become IDs, so FINDOUTMORE rows keep pointing at the same headwords.
+        The whole migration is one transaction.
+        """
+        columns = [row[1] for row in self.__db.execute('PRAGMA table_info(HEADWORDS);')]
+        level = 'LEVEL' if 'LEVEL' in columns else '-1'
+        self.__db.executescript('''BEGIN;
+            DROP VIEW IF EXISTS V_FINDOUTMORE;
+            ALTER TABLE HEADWORDS RENAME TO HEADWORDS_V1;
+            ALTER TABLE FINDOUTMORE RENAME TO FINDOUTMORE_V1;
+            %s
+            INSERT INTO HEADWORDS(ID, HEADWORD, LEVEL)
+                SELECT ROWID, HEADWORD, COALESCE(%s, -1) FROM HEADWORDS_V1;
+            INSERT OR REPLACE INTO FINDOUTMORE(FROM_ID, TO_ID, TYPE_ID)
+                SELECT FROM_ID, TO_ID, COALESCE(TYPE_ID, 0) FROM FINDOUTMORE_V1;
+            DROP TABLE HEADWORDS_V1;
+            DROP TABLE FINDOUTMORE_V1;
+            COMMIT;''' % (self.SCHEMA_SQL, level))
+        logger.info('schema migrated to version %s', self.SCHEMA_VERSION)
+
+    def query_generation(self):
+        """Return META.generation, which changes whenever HEADWORDS or FINDOUTMORE do."""
+        return self.read_one('''SELECT VALUE FROM META WHERE KEY = 'generation';''')[0]
+
+    def query_synced_generation(self):
+        """Return the generation of the database at the last TxtfileSync, or None."""
+        row = self.read_one('''SELECT VALUE FROM META WHERE KEY = 'synced';''')
+        return None if row is None else row[0]
+
+    def query_sync_chunks(self, name):
+        """Return {hash: count} of the chunks of a text file at the last TxtfileSync."""
+        return dict(self.read('''SELECT HASH, COUNT FROM SYNC_CHUNKS WHERE FILE = ?;''', [name]))
+
+    def query_sync_rows(self, name, chunk_hash):
+        """Return the ROWS text of a chunk of a text file at the last TxtfileSync."""
+        return self.read_one('''SELECT ROWS FROM SYNC_CHUNKS WHERE FILE = ? AND HASH = ?;''', [name, chunk_hash])[0]
+
+    def save_sync(self, name, changes):
+        """Apply (hash, count change, rows text) changes to the chunks of a text file.
+
+        This is bookkeeping of the text files, so META.generation is not bumped.
+        """
+        with self.__lock:
+            self.__dirty = True
+            self.__db.executemany('''INSERT OR IGNORE INTO SYNC_CHUNKS(FILE, HASH, COUNT, ROWS) VALUES(?, ?, 0, ?);''',
+                [(name, chunk_hash, rows) for (chunk_hash, count, rows) in changes if count > 0])
+            self.__db.executemany('''UPDATE SYNC_CHUNKS SET COUNT = COUNT + ? WHERE FILE = ? AND HASH = ?;''',
+                [(count, name, chunk_hash) for (chunk_hash, count, rows) in changes])
+            self.__db.execute('''DELETE FROM SYNC_CHUNKS WHERE COUNT <= 0;''')
+
+    def save_synced_generation(self, synced=True):
+        """Record that the text files agree with the database as of the current generation, or that they do not."""
+        with self.__lock:
+            self.__dirty = True
+            if synced:
+                self.__db.execute('''INSERT OR REPLACE INTO META(KEY, VALUE)
+                    SELECT 'synced', VALUE FROM META WHERE KEY = 'generation';''')
+            else:
+                self.__db.execute('''DELETE FROM META WHERE KEY = 'synced';''')
+
+    def load_graph(self):
+        """Build a HeadwordGraph and answer the hot lookups from it from now on."""
+        graph = HeadwordGraph()
+        graph.load(self)
+        self.graph = graph
+        if self.closure is not None:
+            self.load_closure()
+        if self.order is not None:
+            self.load_order()
+        return graph
+
+    def load_closure(self):
+        """Build a PrerequisiteClosure of the graph, kept up to date by its edge changes.
+
+        Return None and keep answering from the database if the graph has more
+        than PrerequisiteClosure.MAX_HEADWORDS headwords.
+        """
+        if self.graph is None:
+            self.load_graph()
+        if len(self.graph.headwords) > PrerequisiteClosure.MAX_HEADWORDS:
+            logger.warning('prerequisite closure not built: %s headwords, more than %s',
+                len(self.graph.headwords), PrerequisiteClosure.MAX_HEADWORDS)
+            self.graph.closure = None
+            self.closure = None
+            return None
+        closure = PrerequisiteClosure(self.graph)
+        closure.build()
+        self.graph.closure = closure
+        self.closure = closure
+        return closure
+
+    def load_order(self):
+        """Build a TopologicalOrder of the graph, used by check_findoutmore() from now on."""
+        if self.graph is None:
+            self.load_graph()
+        order = TopologicalOrder(self.graph)
+        order.build()
+        self.graph.order = order
+        self.order = order
+        return order
+
+    def load_search_index(self):
+        """Build a HeadwordIndex and answer query_headwords_bykey from it from now on."""
+        search_index = HeadwordIndex()
+        search_index.load(self)
+        self.search_index = search_index
+        return search_index
+
+    def query_all_headwords(self):
+        rows = self.read('''SELECT ID, HEADWORD, LEVEL FROM HEADWORDS;''')
+        return rows
+
+    def query_all_findoutmore(self):
+        rows = self.read('''SELECT FROM_ID, TO_ID, TYPE_ID FROM FINDOUTMORE;''')
+        return rows
+
+    def query_headword_id(self, headword):
+        if self.graph is not None:
+            return self.graph.ids.get(headword)
+        row = self.read_one('''SELECT ID FROM HEADWORDS WHERE HEADWORD = ?;''', [headword])
+        return None if row is None else row[0]
+
+    def query_headword_byid(self, headword_id):
+        """Return the (headword, level) row of an id, or None."""
+        if self.graph is not None:
+            return self.graph.query_headword_byid(headword_id)
+        row = self.read_one('''SELECT HEADWORD, LEVEL FROM HEADWORDS WHERE ID = ?;''', [headword_id])
+        return row
+
+    def query_to_ids(self, from_id, type_id=None):
+        """Return (to id, type id) rows of the edges from an id, optionally of one type."""
+        if self.graph is not None:
+            return self.graph.query_to_ids(from_id, type_id)
+        if type_id is None:
+            rows = self.read('''SELECT TO_ID, TYPE_ID FROM FINDOUTMORE WHERE FROM_ID = ?;''', [from_id])
+        else:
+            rows = self.read('''SELECT TO_ID, TYPE_ID FROM FINDOUTMORE
+                WHERE FROM_ID = ? AND TYPE_ID = ?;''', [from_id, type_id])
+        return rows
+
+    def query_from_ids(self, to_id, type_id=None):
+        """Return (from id, type id) rows of the edges to an id, optionally of one type."""
+        if self.graph is not None:
+            return self.graph.query_from_ids(to_id, type_id)
+        if type_id is None:
+            rows = self.read('''SELECT FROM_ID, TYPE_ID FROM FINDOUTMORE WHERE TO_ID = ?;''', [to_id])
+        else:
+            rows = self.read('''SELECT FROM_ID, TYPE_ID FROM FINDOUTMORE
+                WHERE TO_ID = ? AND TYPE_ID = ?;''', [to_id, type_id])
+        return rows
+
+    def query_type_byid(self, from_id, to_id):
+        if self.graph is not None:
+            type_id = self.graph.to_edges.get(from_id, dict()).get(to_id)
+            return None if type_id is None else (type_id,)
+        row = self.read_one('''SELECT TYPE_ID FROM FINDOUTMORE WHERE FROM_ID = ? AND TO_ID = ?;''',
+            [from_id, to_id])
+        return row
+
+    def query_headwords_bykey(self, key=None):
+        if self.search_index is not None:
+            return self.search_index.search(key)
+        if key == None or key == '':
+            rows = self.read('''SELECT HEADWORD FROM HEADWORDS 
+                ORDER BY HEADWORD ASC;''')
+        else:
+            rows = self.read('''SELECT HEADWORD FROM HEADWORDS WHERE HEADWORD LIKE ?  
+                ORDER BY HEADWORD ASC;''', ['%'+key+'%'])
+        return rows
+
+    def query_headwords_byprefix(self, prefix):
+        if self.search_index is not None:
+            return self.search_index.search_prefix(prefix)
+        rows = self.read('''SELECT HEADWORD FROM HEADWORDS WHERE HEADWORD >= ? AND HEADWORD < ?
+            ORDER BY HEADWORD ASC;''', [prefix, prefix + u'\U0010ffff'])
+        return rows
+
+    def query_headwords_page(self, after=None, limit=100, inclusive=False):
+        """Keyset pagination: the next limit headwords after (or from) a headword."""
+        if self.search_index is not None:
+            return self.search_index.page(after, limit, inclusive)
+        if after is None:
+            rows = self.read('''SELECT HEADWORD FROM HEADWORDS
+                ORDER BY HEADWORD ASC LIMIT ?;''', [limit])
+        elif inclusive:
+            rows = self.read('''SELECT HEADWORD FROM HEADWORDS WHERE HEADWORD >= ?
+                ORDER BY HEADWORD ASC LIMIT ?;''', [after, limit])
+        else:
+            rows = self.read('''SELECT HEADWORD FROM HEADWORDS WHERE HEADWORD > ?
+                ORDER BY HEADWORD ASC LIMIT ?;''', [after, limit])
+        return rows
+
+    def query_headwords_offset(self, offset, limit=100):
+        if self.search_index is not None:
+            return [(headword,) for headword in self.search_index.headwords[offset:offset + limit]]
+        rows = self.read('''SELECT HEADWORD FROM HEADWORDS
+            ORDER BY HEADWORD ASC LIMIT ? OFFSET ?;''', [limit, offset])
+        return rows
+
+    def query_headwords_count(self):
+        if self.search_index is not None:
+            return len(self.search_index.headwords)
+        rows = self.read('''SELECT COUNT(*) FROM HEADWORDS;''')
+        count = rows[0][0]
+        return count
+
+    def query_headword_position(self, headword):
+        """Return the number of headwords sorted before headword."""
+        if self.search_index is not None:
+            return bisect.bisect_left(self.search_index.headwords, headword)
+        rows = self.read('''SELECT COUNT(*) FROM HEADWORDS WHERE HEADWORD < ?;''', [headword])
+        position = rows[0][0]
+        return position
+
+    def query_headwords_bylevel(self, level):
+        if self.graph is not None:
+            return self.graph.query_headwords_bylevel(level)
+        rows = self.read('''SELECT HEADWORD, LEVEL FROM HEADWORDS WHERE LEVEL = ?
+            ORDER BY HEADWORD ASC;''', [level])
+        return rows
+
+    def query_from_headwords(self, to_headword):
+        if self.graph is not None:
+            return self.graph.query_from_headwords(to_headword)
+        rows = self.read('''SELECT FROM_HEADWORD FROM V_FINDOUTMORE 
+            WHERE TO_HEADWORD = ? ORDER BY FROM_HEADWORD ASC;''', [to_headword])
+        return rows
+
+    def query_to_headwords(self, from_headword):
+        if self.graph is not None:
+            return self.graph.query_to_headwords(from_headword)
+        rows = self.read('''SELECT TO_HEADWORD FROM V_FINDOUTMORE 
+            WHERE FROM_HEADWORD = ? ORDER BY FROM_HEADWORD ASC;''', [from_headword])
+        return rows
+
+    def query_findoutmore_bytype(self, type_id):
+        if self.graph is not None:
+            return self.graph.query_findoutmore_bytype(type_id)
+        rows = self.read('''SELECT FROM_HEADWORD, TO_HEADWORD FROM V_FINDOUTMORE
+            WHERE TYPE_ID = ?;''', [type_id])
+        return rows
+
+    def query_level(self, headword):
+        if self.graph is not None:
+            return self.graph.query_level(headword)
+        row = self.read_one('''SELECT LEVEL FROM HEADWORDS WHERE HEADWORD = ?;''', [headword])
+        return row
+
+    def query_type(self, from_headword, to_headword):
+        if self.graph is not None:
+            return self.graph.query_type(from_headword, to_headword)
+        row = self.read_one('''SELECT TYPE_ID FROM V_FINDOUTMORE
+            WHERE FROM_HEADWORD = ? AND TO_HEADWORD = ?;''', [from_headword, to_headword])
+        return row
+
+    PREREQUISITES_SQL = '''WITH RECURSIVE CLOSURE(ID) AS (
+            SELECT %(to)s_ID FROM FINDOUTMORE WHERE %(from)s_ID = ? AND TYPE_ID IN (1, 2, 3)
+            UNION SELECT FINDOUTMORE.%(to)s_ID FROM FINDOUTMORE, CLOSURE
+            WHERE FINDOUTMORE.%(from)s_ID = CLOSURE.ID AND FINDOUTMORE.TYPE_ID IN (1, 2, 3))
+        SELECT HEADWORD FROM HEADWORDS WHERE ID IN CLOSURE ORDER BY HEADWORD ASC;'''
+
+    def query_prerequisites(self, headword):
+        """Return (headword,) rows of everything to learn before a headword, following Depends, SubClass and RDepends."""
+        if self.closure is not None:
+            return self.closure.query_prerequisites(headword)
+        rows = self.read(self.PREREQUISITES_SQL % {'from': 'FROM', 'to': 'TO'},
+            [self.query_headword_id(headword)])
+        return rows
+
+    def query_dependents(self, headword):
+        """Return (headword,) rows of everything a headword is a prerequisite of."""
+        if self.closure is not None:
+            return self.closure.query_dependents(headword)
+        rows = self.read(self.PREREQUISITES_SQL % {'from': 'TO', 'to': 'FROM'},
+            [self.query_headword_id(headword)])
+        return rows
+
+    def query_is_prerequisite(self, before_headword, after_headword):
+        if self.closure is not None:
+            return self.closure.query_is_prerequisite(before_headword, after_headword)
+        return (before_headword,) in self.query_prerequisites(after_headword)
+
+    def query_paths(self, from_headword, to_headword, type_ids=None, k=1):
+        """Return up to k shortest chains of findoutmore edges between two headwords, as lists of headwords.
+
+        Only edges of type_ids are followed, all edges if it is None.
+        """
+        from_id = self.query_headword_id(from_headword)
+        to_id = self.query_headword_id(to_headword)
+        if from_id is None or to_id is None:
+            return []
+        def successors(headword_id):
+            return [next_id for (next_id, type_id) in self.query_to_ids(headword_id)
+                if type_ids is None or type_id in type_ids]
+        def predecessors(headword_id):
+            return [previous_id for (previous_id, type_id) in self.query_from_ids(headword_id)
+                if type_ids is None or type_id in type_ids]
+        paths = k_shortest_paths(from_id, to_id, successors, predecessors, k)
+        return [[self.query_headword_byid(headword_id)[0] for headword_id in path] for path in paths]
+
+    def insert_headword(self, headword, level=-1):
+        cursor = self.write('''INSERT OR IGNORE INTO HEADWORDS(HEADWORD, LEVEL) VALUES(?, ?);''', [headword, level])
+        if cursor.rowcount == 1:
+            headword_id = cursor.lastrowid
+        else:
+            self.write('''UPDATE HEADWORDS SET LEVEL = ? WHERE HEADWORD = ?;''', [level, headword])
+            headword_id = self.query_headword_id(headword)
+        if self.graph is not None:
+            self.graph.insert_headword(headword_id, headword, level)
+        if self.search_index is not None:
+            self.search_index.insert_headword(headword)
+        logger.info('headword added: %s, %s', headword, level)
+
+    def save_sequence(self, ranks):
+        """Replace the stored learning sequence with (headword id, rank) rows."""
+        self.write('''DELETE FROM SEQUENCE;''')
+        self.write_many('''INSERT INTO SEQUENCE VALUES(?, ?);''', ranks)
+        logger.info('sequence saved: %s rows', len(ranks))
+
+    def query_sequence(self):
+        rows = self.read('''SELECT HEADWORDS.HEADWORD, SEQUENCE.RANK FROM SEQUENCE, HEADWORDS
+            WHERE HEADWORDS.ID = SEQUENCE.HEADWORD_ID ORDER BY SEQUENCE.RANK ASC;''')
+        return rows
+
+    def insert_headwords(self, rows):
+        """Insert many (id, headword, level) rows with one executemany; return the number inserted.
+
+        Rows whose id or headword is already stored, or comes earlier in rows,
+        are skipped: replacing the stored row would leave the findoutmore rows
+        of its id pointing at no headword, or at another one.
+        """
+        cursor = self.write_many('''INSERT OR IGNORE INTO HEADWORDS(ID, HEADWORD, LEVEL)
+            VALUES(?, ?, ?);''', rows)
+        inserted = cursor.rowcount
+        for (headword_id, headword, level) in rows:
+            if self.graph is not None:
+                if headword_id in self.graph.headwords or headword in self.graph.ids:
+                    continue
+                self.graph.insert_headword(headword_id, headword, level)
+            if self.search_index is not None:
+                self.search_index.insert_headword(headword)
+        return inserted
+
+    def rename_headword(self, headword, new_headword):
+        """Rename a headword in place, keeping its id and so its findoutmore rows."""
+        self.write('''UPDATE HEADWORDS SET HEADWORD = ? WHERE HEADWORD = ?;''', [new_headword, headword])
+        if self.graph is not None:
+            self.graph.rename_headword(headword, new_headword)
+        if self.search_index is not None:
+            self.search_index.remove_headword(headword)
+            self.search_index.insert_headword(new_headword)
+        logger.info('headword renamed: %s -> %s', headword, new_headword)
+
+    def remove_headwords(self, headwords):
+        """Remove many headwords with their findoutmore rows and SEQUENCE ranks."""
+        rows = [(headword,) for headword in headwords]
+        self.write_many('''DELETE FROM FINDOUTMORE
+            WHERE FROM_ID IN (SELECT ID FROM HEADWORDS WHERE HEADWORD = ?1)
+            OR TO_ID IN (SELECT ID FROM HEADWORDS WHERE HEADWORD = ?1);''', rows)
+        self.write_many('''DELETE FROM SEQUENCE WHERE HEADWORD_ID IN (SELECT ID FROM HEADWORDS WHERE HEADWORD = ?);''',
+            rows)
+        self.write_many('''DELETE FROM HEADWORDS WHERE HEADWORD = ?;''', rows)
+        for headword in headwords:
+            if self.graph is not None and headword in self.graph.ids:
+                self.graph.remove_headword(self.graph.ids[headword])
+            if self.search_index is not None:
+                self.search_index.remove_headword(headword)
+        return len(rows)
+
+    def update_level(self, headword, level):
+        if self.journal is not None:
+            self.journal.record('update_level', (headword, level))
+        self.write('''UPDATE OR ROLLBACK HEADWORDS SET LEVEL = ? WHERE HEADWORD = ?;''', [level, headword], True)
+        if self.graph is not None:
+            self.graph.update_level(headword, level)
+        logger.info('headword updated: %s, %s', headword, level)
+
+    def update_levels(self, rows):
+        """Set the levels of many (headword, level) rows with one executemany."""
+        if self.journal is not None:
+            self.journal.record('update_levels', (rows,))
+        self.write_many('''UPDATE HEADWORDS SET LEVEL = ? WHERE HEADWORD = ?;''',
+            [(level, headword) for (headword, level) in rows])
+        if self.graph is not None:
+            for (headword, level) in rows:
+                self.graph.update_level(headword, level)
+        logger.info('levels updated: %s headwords', len(rows))
+
+    def insert_findoutmore(self, from_name, to_name, type_id):
+        if self.journal is not None:
+            self.journal.record('insert_findoutmore', (from_name, to_name, type_id))
+        self.write('''INSERT OR REPLACE INTO FINDOUTMORE
+            SELECT H1.ID, H2.ID, ? FROM HEADWORDS H1, HEADWORDS H2
+            WHERE H1.HEADWORD = ? AND H2.HEADWORD = ?;''', [type_id, from_name, to_name], True)
+        if self.graph is not None:
+            self.graph.insert_findoutmore(from_name, to_name, type_id)
+        logger.info('findoutmore added: %s -> %s : %s', from_name, to_name, type_id)
+
+    def check_findoutmore(self, from_name, to_name, type_id):
+        """Raise CycleError if from_name -> to_name of type_id would close a cycle of prerequisites.
+
+        The order is updated as if the edge was inserted, so inserting it next is cheap.
+        """
+        if type_id not in TopologicalOrder.TYPE_IDS:
+            return
+        if self.order is None:
+            self.load_order()
+        from_id = self.graph.ids.get(from_name)
+        to_id = self.graph.ids.get(to_name)
+        if from_id is None or to_id is None:
+            return
+        path = self.order.insert_edge(from_id, to_id)
+        if path is not None:
+            raise CycleError([from_name] + [self.graph.headwords[i] for i in reversed(path)])
+
+    def save_findoutmore(self, from_name, to_name, type_id):
+        """Set the edge from_name -> to_name as the editor does; return the (from, to, type) stored.
+
+        An RDepends edge is stored reversed, replacing from_name -> to_name,
+        and a SubClass edge replaces the SubClass parent of from_name. If the
+        edge would close a cycle, the removed edges are put back and
+        CycleError is raised.
+        """
+        if type_id == self.RDEPENDS_TYPE_ID:
+            old = self.query_type(from_name, to_name)
+            removed = [] if old is None else [(from_name, to_name, old[0])]
+            self.remove_findoutmore(from_name, to_name)
+            (from_name, to_name) = (to_name, from_name)
+        elif type_id == self.SUBCLASS_TYPE_ID:
+            removed = [(from_name, row[0], type_id) for row in self.query_to_headwords(from_name)
+                if self.query_type(from_name, row[0]) == (type_id,)]
+            self.remove_findoutmore_by_fromname_typeid(from_name, type_id)
+        else:
+            removed = []
+        try:
+            self.check_findoutmore(from_name, to_name, type_id)
+        except CycleError:
+            for (removed_from, removed_to, removed_type_id) in removed:
+                self.insert_findoutmore(removed_from, removed_to, removed_type_id)
+            raise
+        self.insert_findoutmore(from_name, to_name, type_id)
+        return (from_name, to_name, type_id)
+
+    def insert_findoutmores(self, rows):
+        """Insert many (from id, to id, type id) rows with one executemany.
+
+        Rows whose ids are not in HEADWORDS are skipped; return the number inserted.
+        """
+        cursor = self.write_many('''INSERT OR REPLACE INTO FINDOUTMORE
+            SELECT ?1, ?2, ?3 WHERE EXISTS(SELECT 1 FROM HEADWORDS WHERE ID = ?1)
+            AND EXISTS(SELECT 1 FROM HEADWORDS WHERE ID = ?2);''', rows)
+        inserted = cursor.rowcount
+        if self.graph is not None:
+            for (from_id, to_id, type_id) in rows:
+                self.graph.add_findoutmore(from_id, to_id, type_id)
+        return inserted
+
+    def remove_findoutmores(self, rows):
+        """Remove many (from id, to id) rows with one executemany."""
+        self.write_many('''DELETE FROM FINDOUTMORE WHERE FROM_ID = ? AND TO_ID = ?;''', rows)
+        if self.graph is not None:
+            for (from_id, to_id) in rows:
+                self.graph.discard_findoutmore(from_id, to_id)
+        return len(rows)
+
+    def remove_findoutmore(self, from_name, to_name):
+        if self.journal is not None:
+            self.journal.record('remove_findoutmore', (from_name, to_name))
+        self.write('''DELETE FROM FINDOUTMORE WHERE 
+            FROM_ID IN (SELECT ID FROM HEADWORDS WHERE HEADWORD = ?) AND 
+            TO_ID IN (SELECT ID FROM HEADWORDS WHERE HEADWORD = ?);''', [from_name, to_name], True)
+        if self.graph is not None:
+            self.graph.remove_findoutmore(from_name, to_name)
+        logger.info('findoutmore removed: %s -> %s', from_name, to_name)
+
+    def remove_findoutmore_by_fromname_typeid(self, from_name, type_id):
+        if self.journal is not None:
+            self.journal.record('remove_findoutmore_by_fromname_typeid', (from_name, type_id))
+        self.write('''DELETE FROM FINDOUTMORE WHERE 
+            FROM_ID IN (SELECT ID FROM HEADWORDS WHERE HEADWORD = ?) AND 
+            TYPE_ID = ?;''', [from_name, type_id], True)
+        if self.graph is not None:
+            self.graph.remove_findoutmore_by_fromname_typeid(from_name, type_id)
+        logger.info('findoutmore removed: %s -> * : %s', from_name, type_id)
+
+class WriteJournal():
+    """Write-behind journal for the editor writes of a DbStorage.
+
+    The writes still go to the HeadwordGraph at once, but their SQL is queued
+    here and committed by a background thread in one transaction when
+    max_pending statements are waiting or the oldest has waited max_delay
+    seconds. Writes done inside edit() are grouped for undo() and redo().
+    """
+    MAX_PENDING = 200
+    MAX_DELAY = 1.0
+
+    def __init__(self, db, max_pending=MAX_PENDING, max_delay=MAX_DELAY):
+        if db.graph is None:
+            db.load_graph() # undo records are read from the graph, which is ahead of the database
+        self.db = db
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self.pending = list()       # [(sql, parameters)] not yet committed
+        self.pending_since = None   # time the oldest pending statement was queued
+        self.closed = False
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.group = None           # [(op, args, inverse ops)] of the current edit
+        self.undo_stack = list()
+        self.redo_stack = list()
+        self.thread = threading.Thread(target=self.run, name='WriteJournal')
+        self.thread.daemon = True
+        db.journal = self
+        self.thread.start()
+
+    def queue(self, sql, parameters):
+        with self.condition:
+            self.pending.append((sql, parameters))
+            if self.pending_since is None:
+                self.pending_since = time.time()
+                self.condition.notify() # start the max_delay timer
+            elif len(self.pending) >= self.max_pending:
+                self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.closed:
+                    if self.pending:
+                        delay = self.pending_since + self.max_delay - time.time()
+                        if delay <= 0 or len(self.pending) >= self.max_pending:
+                            break
+                    else:
+                        delay = None
+                    self.condition.wait(delay)
+                if self.closed:
+                    return
+            if not self.flush(False):
+                with self.condition:
+                    self.condition.wait(self.max_delay)
+
+    def flush(self, raise_error=True):
+        """Commit the pending statements in one transaction; return False if that failed.
+
+        With none pending, the writes done directly on the storage, such as
+        write_many(), are committed instead.
+        """
+        with self.flush_lock:
+            with self.condition:
+                (statements, self.pending, self.pending_since) = (self.pending, list(), None)
+            try:
+                if not statements:
+                    self.db.commit()
+                    return True
+                self.db.write_batch(statements)
+            except sqlite3.Error:
+                logger.exception('journal flush failed, %s statements kept', len(statements))
+                with self.condition:
+                    self.pending[:0] = statements
+                    self.pending_since = time.time()
+                if raise_error:
+                    raise
+                return False
+        logger.debug('journal flushed: %s', len(statements))
+        return True
+
+    def close(self):
+        """Stop the background thread and commit whatever is still pending."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        self.flush()
+        self.db.journal = None
+
+    @contextlib.contextmanager
+    def edit(self):
+        """Group the writes made in the block into one undoable edit; an exception undoes them."""
+        self.group = list()
+        try:
+            yield
+        except Exception:
+            (group, self.group) = (self.group, None)
+            self.replay([inverse_op for (op, args, inverse) in reversed(group) for inverse_op in inverse])
+            raise
+        finally:
+            (group, self.group) = (self.group, None)
+            if group:
+                self.undo_stack.append(group)
+                del self.redo_stack[:]
+
+    def record(self, op, args):
+        """Remember how to undo a DbStorage write that is about to be done."""
+        if self.group is not None:
+            self.group.append((op, args, self.inverse(op, args)))
+
+    def inverse(self, op, args):
+        graph = self.db.graph
+        if op == 'update_level':
+            old = graph.query_level(args[0])
+            return [] if old is None else [('update_level', (args[0], old[0]))]
+        if op == 'update_levels':
+            olds = [(headword, graph.query_level(headword)) for (headword, level) in args[0]]
+            return [('update_levels', (tuple((headword, old[0]) for (headword, old) in olds if old is not None),))]
+        if op == 'insert_findoutmore':
+            old = graph.query_type(args[0], args[1])
+            if old is None:
+                return [('remove_findoutmore', args[:2])]
+            return [('insert_findoutmore', args[:2] + old)]
+        if op == 'remove_findoutmore':
+            old = graph.query_type(args[0], args[1])
+            return [] if old is None else [('insert_findoutmore', args + old)]
+        if op == 'remove_findoutmore_by_fromname_typeid':
+            (from_name, type_id) = args
+            return [('insert_findoutmore', (from_name, row[0], type_id))
+                for row in graph.query_to_headwords(from_name)
+                if graph.query_type(from_name, row[0]) == (type_id,)]
+        raise ValueError('not a journaled write: %s' % op)
+
+    def replay(self, ops):
+        for (op, args) in ops:
+            getattr(self.db, op)(*args)
+
+    def undo(self):
+        """Undo the last edit; return the (op, args) writes done for it."""
+        if not self.undo_stack:
+            return []
+        group = self.undo_stack.pop()
+        ops = [inverse_op for (op, args, inverse) in reversed(group) for inverse_op in inverse]
+        self.replay(ops)
+        self.redo_stack.append(group)
+        return ops
+
+    def redo(self):
+        """Redo the last undone edit; return the (op, args) writes done for it."""
+        if not self.redo_stack:
+            return []
+        group = self.redo_stack.pop()
+        ops = [(op, args) for (op, args, inverse) in group]
+        self.replay(ops)
+        self.undo_stack.append(group)
+        return ops
+
+class ImportStats():
+    """Counters of one bulk text file import."""
+    MAX_REJECTED_LINES = 100
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lines = 0
+        self.rows = 0
+        self.rejected = 0
+        self.rejected_lines = list()    # [(line number, line)], at most MAX_REJECTED_LINES
+        self.duplicates = list()        # [(line number, headword, [(distance, headword, id)])] of near-duplicates
+        self.merged = 0                 # near-duplicate headwords merged, and findoutmore rows dropped as self-loops
+        self.started = time.time()
+        self.seconds = 0.0
+
+    def reject(self, lineno, line):
+        self.rejected += 1
+        if len(self.rejected_lines) < self.MAX_REJECTED_LINES:
+            self.rejected_lines.append((lineno, line))
+        logger.warning('%s:%s: rejected: %r', self.filename, lineno, line)
+
+    def duplicate(self, lineno, headword, similar, merged):
+        self.duplicates.append((lineno, headword, similar))
+        if merged:
+            self.merged += 1
+        logger.warning('%s:%s: %s %r, near-duplicate of %s', self.filename, lineno, 'merged' if merged else 'kept',
+            headword, ', '.join('%r' % match[1] for match in similar))
+
+    def finish(self):
+        self.seconds = time.time() - self.started
+        logger.info('%s: %s lines, %s rows, %s rejected, %s near-duplicates, %s merged in %.3fs (%.0f rows/s)',
+            self.filename, self.lines, self.rows, self.rejected, len(self.duplicates), self.merged, self.seconds,
+            self.rows_per_second())
+        return self
+
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+class TxtfileStorage:
+    """Bulk loader of headwords.txt/findoutmore.txt into a DbStorage.
+
+    Files are read in chunks of CHUNK_SIZE lines and every chunk goes to the
+    database with one executemany. Nothing is committed here, so a whole load
+    stays in one transaction until the caller runs db_save().
+
+    With duplicates='flag' or 'merge', every headword is first looked up in a
+    NearDuplicateIndex of the headwords already in the database and those
+    imported before it. 'flag' imports near-duplicates and reports them;
+    'merge' drops them and points their findoutmore rows at the headword they
+    duplicate.
+    """
+    CHUNK_SIZE = 10000
+
+    def __init__(self, db, duplicates=None, max_distance=NearDuplicateIndex.MAX_DISTANCE):
+        self.HEADWORS_TXTFILE_LINE_PATTERN = re.compile(r'\A([\w\s&-]+)\n+\Z')
+        self.FINDOUTMORE_TXTFILE_LINE_PATTERN = re.compile(r'\A(\d+) -> (\d+) : (\d+)\n+\Z')
+        self.db = db
+        if duplicates not in (None, 'flag', 'merge'):
+            raise ValueError('duplicates must be None, flag or merge: %r' % duplicates)
+        self.duplicates = duplicates
+        self.max_distance = max_distance
+        self.duplicate_index = None     # NearDuplicateIndex, built on the first headwords file
+        self.merged_ids = dict()        # id in the text files -> id of the headword stored for it
+
+    def process_headwords_txtfile_line(self, line):
+        """Get a headword from a line of string from headword.txt, or None."""
+        m = self.HEADWORS_TXTFILE_LINE_PATTERN.match(line)
+        if m:
+            return m.group(1)
+        return None
+
+    def process_findoutmore_txtfile_line(self, line):
+        """Get a (from id, to id, type id) row from a line of string from findoutmore.txt, or None."""
+        m = self.FINDOUTMORE_TXTFILE_LINE_PATTERN.match(line)
+        if m:
+            (fr_id, to_id, type_id) = m.groups()
+            return (int(fr_id) + 1, int(to_id) + 1, int(type_id))
+        return None
+
+    def read_txtfile_chunks(self, filename):
+        """Yield lists of (line number, line) of at most CHUNK_SIZE lines."""
+        with io.open(filename, encoding='utf-8') as f:
+            lineno = 0
+            while True:
+                chunk = list()
+                for line in itertools.islice(f, self.CHUNK_SIZE):
+                    lineno += 1
+                    if not line.endswith('\n'):
+                        line += '\n'
+                    chunk.append((lineno, line))
+                if not chunk:
+                    break
+                yield chunk
+
+    def process_headwords_txtfile(self, filename):
+        """process headword.txt file chunk by chunk; blank lines separate groups.
+
+        The n-th non-blank line gets headword id n, which is what the ids in
+        findoutmore.txt refer to, so a rejected line still uses up its id.
+        A headword already stored keeps its row, id and level, and a new one
+        whose id is taken gets the next free id; merged_ids maps findoutmore.txt
+        onto both.
+        """
+        stats = ImportStats(filename)
+        stored = self.db.query_all_headwords()
+        if self.duplicates is not None and self.duplicate_index is None:
+            self.duplicate_index = NearDuplicateIndex(self.max_distance)
+            for (headword_id, headword, level) in stored:
+                self.duplicate_index.add(headword, headword_id)
+        headword_id = 0
+        ids = dict((headword, stored_id) for (stored_id, headword, level) in stored)
+        used_ids = set(ids.values())
+        next_id = max(used_ids | set([0])) + 1  # for new headwords whose line id is taken
+        for chunk in self.read_txtfile_chunks(filename):
+            rows = list()
+            for (lineno, line) in chunk:
+                if line.strip() == '':
+                    continue
+                headword_id += 1
+                headword = self.process_headwords_txtfile_line(line)
+                if headword is None:
+                    stats.reject(lineno, line)
+                    continue
+                stored_id = ids.get(headword)
+                if stored_id is not None:
+                    if stored_id != headword_id:
+                        self.merged_ids[headword_id] = stored_id
+                    continue
+                if self.duplicate_index is not None:
+                    similar = self.duplicate_index.find(headword)
+                    if similar:
+                        stats.duplicate(lineno, headword, similar, self.duplicates == 'merge')
+                        if self.duplicates == 'merge':
+                            self.merged_ids[headword_id] = similar[0][2]
+                            continue
+                new_id = headword_id
+                if new_id in used_ids:
+                    while next_id in used_ids:
+                        next_id += 1
+                    new_id = next_id
+                    self.merged_ids[headword_id] = new_id
+                used_ids.add(new_id)
+                if self.duplicate_index is not None:
+                    self.duplicate_index.add(headword, new_id)
+                ids[headword] = new_id
+                rows.append((new_id, headword, -1))
+            stats.lines += len(chunk)
+            stats.rows += self.db.insert_headwords(rows)
+        return stats.finish()
+
+    def process_findoutmore_txtfile(self, filename):
+        """process findoutmore.txt file chunk by chunk."""
+        stats = ImportStats(filename)
+        for chunk in self.read_txtfile_chunks(filename):
+            rows = list()
+            for (lineno, line) in chunk:
+                if line.strip() == '':
+                    continue
+                findoutmore = self.process_findoutmore_txtfile_line(line)
+                if findoutmore is None:
+                    stats.reject(lineno, line)
+                    continue
+                if self.merged_ids:
+                    (from_id, to_id, type_id) = findoutmore
+                    findoutmore = (self.merged_ids.get(from_id, from_id), self.merged_ids.get(to_id, to_id), type_id)
+                    if findoutmore[0] == findoutmore[1]:
+                        stats.merged += 1
+                        continue
+                rows.append(findoutmore)
+            stats.lines += len(chunk)
+            inserted = self.db.insert_findoutmores(rows)
+            if inserted < len(rows):
+                stats.rejected += len(rows) - inserted
+                logger.warning('%s: %s rows refer to unknown headword ids', filename, len(rows) - inserted)
+            stats.rows += inserted
+        return stats.finish()
+
+def plan_levels(db):
+    """Return ([(headword, old level, new level)], orphans, conflicts) of levelling by SubClass depth.
+
+    Orphans have no SubClass edge at all; they and the conflicts of
+    HeadwordHierarchy.depths() without a depth keep their level.
+    """
+    hierarchy = HeadwordHierarchy()
+    hierarchy.build([], db.query_findoutmore_bytype(HeadwordHierarchy.SUBCLASS_TYPE_ID))
+    (depths, conflicts) = hierarchy.depths()
+    if db.journal is not None:
+        db.journal.flush()      # queued level updates are read back below
+    changes = list()
+    orphans = list()
+    for (headword_id, headword, level) in sorted(db.query_all_headwords(), key=lambda row: row[1]):
+        if headword not in hierarchy.children and headword not in hierarchy.parents:
+            orphans.append(headword)
+        elif headword in depths and depths[headword] != level:
+            changes.append((headword, level, depths[headword]))
+    return (changes, orphans, conflicts)
+
+def update_levels(db, dry_run=False):
+    """Set LEVEL of every headword in the SubClass forest to its depth and commit it as one transaction.
+
+    Return what plan_levels() found; with dry_run nothing is written.
+    """
+    (changes, orphans, conflicts) = plan_levels(db)
+    logger.info('levels: %s to change, %s orphans, %s conflicts', len(changes), len(orphans), len(conflicts))
+    if changes and not dry_run:
+        db.update_levels(tuple((headword, new_level) for (headword, old_level, new_level) in changes))
+        db.db_save()
+    return (changes, orphans, conflicts)
+
+def update_sequence(db):
+    """Recompute the learning sequence of a DbStorage and store it in SEQUENCE."""
+    sequence = LearningSequence()
+    sequence.load(db)
+    db.save_sequence(sequence.ranks())
+    db.db_save()
+    return sequence
+
+PROFILER.register(DbStorage, ['db_save', 'load_graph', 'load_search_index', 'load_closure', 'load_order',
+    'check_findoutmore', 'save_sequence', 'save_sync', 'save_synced_generation', 'rename_headword', 'update_level', 'update_levels'] +
+    sorted(name for name in vars(DbStorage) if name.startswith(('query_', 'insert_', 'remove_'))))
+PROFILER.register(WriteJournal, ['flush'])
+PROFILER.register(TxtfileStorage, ['process_headwords_txtfile', 'process_findoutmore_txtfile'])
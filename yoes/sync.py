@@ -0,0 +1,356 @@
+"""Incremental two-way sync of headwords.txt/findoutmore.txt with the database.
+
+The text files number headwords by line, so one headword inserted near the
+top renumbers every findoutmore line below it. The database is synced by
+name instead: a headword keeps its HEADWORDS id for as long as its name is
+in headwords.txt, wherever its line moves, and that id is what findoutmore
+rows are remembered by.
+
+Both files are cut into content-defined chunks: a chunk ends after a line
+whose CRC32 is a multiple of CHUNK_LINES, so an edit only changes the
+chunks around it, however many lines it moves. SYNC_CHUNKS keeps the hash
+of every chunk seen by the last sync with its rows: headwords by name,
+findoutmore rows by id. A pull parses only the chunks that are new since
+then and applies the difference between their rows and the rows of the
+chunks that are gone, in one transaction. A push rewrites the files from
+the database, keeping the lines already there in their order; line
+numbers make that linear, so sync() only pushes when the database changed
+since the last sync, or when headword lines moved under findoutmore.txt.
+
+A headword line replaced in place within its chunk is taken for a rename:
+the headword keeps its id, and so its findoutmore rows.
+
+The first sync has no chunks to tell which side changed what, so unless the
+database is empty it only pushes: the database, which holds the types set
+in the editor, wins. A
+pulled row never changes the type of a stored edge either, unless the line
+that held that edge is gone or changed.
+"""
+
+from __future__ import absolute_import
+
+import io
+import os
+import sys
+import json
+import time
+import zlib
+import hashlib
+import shutil
+import logging
+import tempfile
+
+from .storage import TxtfileStorage
+
+logger = logging.getLogger(__name__)
+
+HEADWORDS = 'headwords'
+FINDOUTMORE = 'findoutmore'
+
+def keep_mode(temp_filename, filename):
+    """Keep the mode of a rewritten text file; mkstemp() creates 0600, which would hide it from others."""
+    if os.path.exists(filename):
+        shutil.copymode(filename, temp_filename)
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_filename, 0o666 & ~umask)
+
+class SyncStats():
+    """Counters of one pull or push."""
+    def __init__(self, direction):
+        self.direction = direction
+        self.headword_chunks = 0        # chunks of headwords.txt new or gone since the last sync
+        self.findoutmore_chunks = 0     # chunks of findoutmore.txt new or gone since the last sync
+        self.inserted_headwords = 0
+        self.renamed_headwords = 0
+        self.removed_headwords = 0
+        self.inserted_findoutmore = 0
+        self.removed_findoutmore = 0
+        self.rejected = 0               # lines that are not a headword, or not a row between two headwords
+        self.started = time.time()
+        self.seconds = 0.0
+
+    def finish(self):
+        self.seconds = time.time() - self.started
+        logger.info('%s: %s + %s chunks, headwords +%s ~%s -%s, findoutmore +%s -%s, %s rejected in %.3fs',
+            self.direction, self.headword_chunks, self.findoutmore_chunks, self.inserted_headwords,
+            self.renamed_headwords, self.removed_headwords, self.inserted_findoutmore, self.removed_findoutmore,
+            self.rejected, self.seconds)
+        return self
+
+    def summary(self):
+        return dict((key, value) for (key, value) in vars(self).items() if key != 'started')
+
+class TxtfileSync():
+    """Two-way sync of a headwords and a findoutmore text file with a DbStorage."""
+    CHUNK_LINES = 32    # average lines per chunk
+
+    def __init__(self, db, headwords_filename='headwords.txt', findoutmore_filename='findoutmore.txt'):
+        self.db = db
+        self.txtfile = TxtfileStorage(db)
+        self.filenames = {HEADWORDS: headwords_filename, FINDOUTMORE: findoutmore_filename}
+
+    def read_lines(self, name):
+        filename = self.filenames[name]
+        if not os.path.exists(filename):
+            return []
+        with io.open(filename, encoding='utf-8') as f:
+            return [line if line.endswith('\n') else line + '\n' for line in f]
+
+    def write_lines(self, name, lines):
+        """Replace a text file atomically, unless it already has these lines."""
+        if lines == self.read_lines(name):
+            return
+        filename = self.filenames[name]
+        (fd, temp_filename) = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(filename)))
+        try:
+            with io.open(fd, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(u''.join(lines))
+            keep_mode(temp_filename, filename)
+            if os.path.exists(filename) and sys.platform.startswith('win'):
+                os.remove(filename)
+            os.rename(temp_filename, filename)
+        except Exception:
+            os.remove(temp_filename)
+            raise
+        logger.info('%s written: %s lines', filename, len(lines))
+
+    def split_chunks(self, lines):
+        """Return [(hash, lines)] of the content-defined chunks of lines."""
+        chunks = list()
+        start = 0
+        for (i, line) in enumerate(lines):
+            if (zlib.crc32(line.encode('utf-8')) & 0xffffffff) % self.CHUNK_LINES == 0 or i == len(lines) - 1:
+                text = u''.join(lines[start:i + 1]).encode('utf-8')
+                chunks.append((hashlib.sha1(text).hexdigest(), lines[start:i + 1]))
+                start = i + 1
+        return chunks
+
+    def diff(self, name, chunks):
+        """Return ([(hash, count, lines)] of the new chunks, [(hash, count)] of the gone ones) of a file."""
+        stored = self.db.query_sync_chunks(name)
+        current = dict()
+        for (chunk_hash, lines) in chunks:
+            current.setdefault(chunk_hash, [0, lines])[0] += 1
+        new = [(chunk_hash, count - stored.get(chunk_hash, 0), lines)
+            for (chunk_hash, (count, lines)) in current.items() if count > stored.get(chunk_hash, 0)]
+        gone = [(chunk_hash, count - current.get(chunk_hash, [0])[0])
+            for (chunk_hash, count) in stored.items() if count > current.get(chunk_hash, [0])[0]]
+        return (new, gone)
+
+    def stored_rows(self, name, chunk_hash):
+        return [tuple(row) if isinstance(row, list) else row
+            for row in json.loads(self.db.query_sync_rows(name, chunk_hash))]
+
+    def parse_headwords(self, lines, stats):
+        headwords = list()
+        for line in lines:
+            if line.strip() == '':
+                continue
+            headword = self.txtfile.process_headwords_txtfile_line(line)
+            if headword is None:
+                stats.rejected += 1
+                logger.warning('%s: rejected: %r', self.filenames[HEADWORDS], line)
+            else:
+                headwords.append(headword)
+        return headwords
+
+    def headword_positions(self, lines):
+        """Return the headword of every non-blank line: the n-th is what n refers to in findoutmore.txt."""
+        return [line.rstrip('\n') for line in lines if line.strip() != '']
+
+    def parse_findoutmore(self, lines, positions, ids, stats):
+        """Return the (from id, to id, type id) rows of lines; positions and ids map line numbers to ids."""
+        rows = list()
+        for line in lines:
+            if line.strip() == '':
+                continue
+            row = self.txtfile.process_findoutmore_txtfile_line(line)
+            (from_id, to_id) = (None, None)
+            if row is not None and 0 < row[0] <= len(positions) and 0 < row[1] <= len(positions):
+                (from_id, to_id) = (ids(positions[row[0] - 1]), ids(positions[row[1] - 1]))
+            if from_id is None or to_id is None:
+                stats.rejected += 1
+                logger.warning('%s: rejected: %r', self.filenames[FINDOUTMORE], line)
+            else:
+                rows.append((from_id, to_id, row[2]))
+        return rows
+
+    def renames(self, new_chunks, gone_chunks):
+        """Yield (old, new) headwords on the same line of a gone chunk and of the new chunk replacing it.
+
+        A gone chunk is paired with the new chunk starting or ending with the
+        same headword, or with the only new chunk left if it is the only one left.
+        """
+        ends = dict()
+        for (i, headwords) in enumerate(gone_chunks):
+            if headwords:
+                ends.setdefault(('first', headwords[0]), i)
+                ends.setdefault(('last', headwords[-1]), i)
+        pairs = list()
+        paired = set()
+        unpaired = list()
+        for headwords in new_chunks:
+            i = ends.get(('first', headwords[0]), ends.get(('last', headwords[-1]))) if headwords else None
+            if i is None or i in paired:
+                unpaired.append(headwords)
+            else:
+                paired.add(i)
+                pairs.append((gone_chunks[i], headwords))
+        left = [headwords for (i, headwords) in enumerate(gone_chunks) if i not in paired]
+        if len(left) == 1 and len(unpaired) == 1:
+            pairs.append((left[0], unpaired[0]))
+        for (old_headwords, new_headwords) in pairs:
+            if len(old_headwords) == len(new_headwords):
+                for (old, new) in zip(old_headwords, new_headwords):
+                    if old != new:
+                        yield (old, new)
+
+    def first_sync(self):
+        """Tell whether no sync has recorded the text files of a database that has headwords yet."""
+        return self.db.query_synced_generation() is None and not self.db.query_sync_chunks(HEADWORDS) \
+            and not self.db.query_sync_chunks(FINDOUTMORE) and self.db.query_headwords_count() > 0
+
+    def pull(self):
+        """Apply the changes of the text files since the last sync to the database in one transaction.
+
+        Nothing is pulled into a database with headwords before its first sync, which is a push.
+        """
+        stats = SyncStats('pull')
+        if self.first_sync():
+            logger.warning('no sync yet: %s and %s are left to the push', self.filenames[HEADWORDS],
+                self.filenames[FINDOUTMORE])
+            return stats.finish()
+        synced = self.db.query_generation() == self.db.query_synced_generation()
+        headword_lines = self.read_lines(HEADWORDS)
+        (new, gone) = self.diff(HEADWORDS, self.split_chunks(headword_lines))
+        (new_findoutmore, gone_findoutmore) = self.diff(FINDOUTMORE, self.split_chunks(self.read_lines(FINDOUTMORE)))
+        stats.headword_chunks = len(new) + len(gone)
+        stats.findoutmore_chunks = len(new_findoutmore) + len(gone_findoutmore)
+        if stats.headword_chunks + stats.findoutmore_chunks == 0:
+            return stats.finish()
+
+        new_chunks = [self.parse_headwords(lines, stats) for (chunk_hash, count, lines) in new]
+        gone_chunks = [self.stored_rows(HEADWORDS, chunk_hash) for (chunk_hash, count) in gone]
+        present = set(headword_lines)
+        inserted = set(headword for headwords in new_chunks for headword in headwords)
+        removed = set(headword for headwords in gone_chunks for headword in headwords if headword + '\n' not in present)
+        for (old, renamed) in self.renames(new_chunks, gone_chunks):
+            if old in removed and renamed in inserted and self.db.query_headword_id(old) is not None \
+                    and self.db.query_headword_id(renamed) is None:
+                self.db.rename_headword(old, renamed)
+                removed.discard(old)
+                inserted.discard(renamed)
+                stats.renamed_headwords += 1
+        removed = sorted(headword for headword in removed if self.db.query_headword_id(headword) is not None)
+        stats.removed_headwords = self.db.remove_headwords(removed) if removed else 0
+        for headword in sorted(inserted):
+            if self.db.query_headword_id(headword) is None:
+                self.db.insert_headword(headword)
+                stats.inserted_headwords += 1
+
+        # findoutmore.txt is read through the current line numbers, after the headwords are in
+        positions = self.headword_positions(headword_lines) if new_findoutmore else []
+        new_rows = [self.parse_findoutmore(lines, positions, self.db.query_headword_id, stats)
+            for (chunk_hash, count, lines) in new_findoutmore]
+        gone_rows = set(row for (chunk_hash, count) in gone_findoutmore
+            for row in self.stored_rows(FINDOUTMORE, chunk_hash))
+        inserted_rows = set(row for rows in new_rows for row in rows)
+        removed_rows = sorted((from_id, to_id) for (from_id, to_id, type_id) in gone_rows - inserted_rows)
+        stats.removed_findoutmore = self.db.remove_findoutmores(removed_rows) if removed_rows else 0
+        inserted_rows = inserted_rows - gone_rows
+        if inserted_rows:
+            # a stored edge keeps its type, and an RDepends edge is stored reversed, as the editor sets it
+            edges = dict(((from_id, to_id), type_id) for (from_id, to_id, type_id) in self.db.query_all_findoutmore())
+            inserted_rows = [(from_id, to_id, type_id) for (from_id, to_id, type_id) in inserted_rows
+                if (from_id, to_id) not in edges and edges.get((to_id, from_id)) != self.db.RDEPENDS_TYPE_ID]
+        inserted_rows = sorted(inserted_rows)
+        stats.inserted_findoutmore = self.db.insert_findoutmores(inserted_rows) if inserted_rows else 0
+
+        self.db.save_sync(HEADWORDS, [(chunk_hash, count, json.dumps(headwords))
+            for ((chunk_hash, count, lines), headwords) in zip(new, new_chunks)] +
+            [(chunk_hash, -count, None) for (chunk_hash, count) in gone])
+        self.db.save_sync(FINDOUTMORE, [(chunk_hash, count, json.dumps(rows))
+            for ((chunk_hash, count, lines), rows) in zip(new_findoutmore, new_rows)] +
+            [(chunk_hash, -count, None) for (chunk_hash, count) in gone_findoutmore])
+        # moved headword lines leave stale line numbers in findoutmore.txt until the next push
+        self.db.save_synced_generation(synced and stats.headword_chunks == 0 and stats.rejected == 0)
+        self.db.db_save()
+        return stats.finish()
+
+    def push(self):
+        """Rewrite the text files from the database, keeping their lines in order and appending new ones.
+
+        Changes made to the files since the last sync are overwritten: pull them first.
+        """
+        stats = SyncStats('push')
+        names = dict((headword_id, headword) for (headword_id, headword, level) in self.db.query_all_headwords())
+        ids = dict((headword, headword_id) for (headword_id, headword) in names.items())
+        old_lines = self.read_lines(HEADWORDS)
+        old_positions = self.headword_positions(old_lines)
+        lines = list()
+        kept = set()
+        for line in old_lines:
+            headword = line.rstrip('\n')
+            if line.strip() == '':
+                lines.append(line)
+            elif headword in ids and headword not in kept:
+                kept.add(headword)
+                lines.append(line)
+            else:
+                stats.removed_headwords += 1
+        new_headwords = [names[headword_id] for headword_id in sorted(names) if names[headword_id] not in kept]
+        if new_headwords and lines and lines[-1].strip() != '':
+            lines.append(u'\n')
+        lines.extend(headword + u'\n' for headword in new_headwords)
+        stats.inserted_headwords = len(new_headwords)
+
+        positions = self.headword_positions(lines)
+        index = dict((ids[headword], i) for (i, headword) in enumerate(positions))
+        edges = dict(((from_id, to_id), type_id) for (from_id, to_id, type_id) in self.db.query_all_findoutmore()
+            if from_id in index and to_id in index)
+        # lines are read as the last sync read them, as their line numbers may be stale by now
+        stored = self.db.query_sync_chunks(FINDOUTMORE)
+        old_rows = list()
+        for (chunk_hash, chunk_lines) in self.split_chunks(self.read_lines(FINDOUTMORE)):
+            if chunk_hash in stored:
+                old_rows.extend(self.stored_rows(FINDOUTMORE, chunk_hash))
+            else:
+                old_rows.extend(self.parse_findoutmore(chunk_lines, old_positions, ids.get, stats))
+        findoutmore_lines = list()
+        written = set()
+        for (from_id, to_id, type_id) in old_rows:
+            edge = (from_id, to_id)
+            if edge in edges and edge not in written:
+                written.add(edge)
+                findoutmore_lines.append(u'%d -> %d : %d\n' % (index[edge[0]], index[edge[1]], edges[edge]))
+        stats.removed_findoutmore = len(old_rows) - len(written)
+        for edge in sorted(set(edges) - written, key=lambda edge: (index[edge[0]], index[edge[1]])):
+            findoutmore_lines.append(u'%d -> %d : %d\n' % (index[edge[0]], index[edge[1]], edges[edge]))
+        stats.inserted_findoutmore = len(edges) - len(written)
+        self.write_lines(HEADWORDS, lines)
+        self.write_lines(FINDOUTMORE, findoutmore_lines)
+
+        (new, gone) = self.diff(HEADWORDS, self.split_chunks(lines))
+        stats.headword_chunks = len(new) + len(gone)
+        self.db.save_sync(HEADWORDS, [(chunk_hash, count, json.dumps(self.parse_headwords(chunk_lines, stats)))
+            for (chunk_hash, count, chunk_lines) in new] + [(chunk_hash, -count, None) for (chunk_hash, count) in gone])
+        (new, gone) = self.diff(FINDOUTMORE, self.split_chunks(findoutmore_lines))
+        stats.findoutmore_chunks = len(new) + len(gone)
+        self.db.save_sync(FINDOUTMORE, [(chunk_hash, count,
+            json.dumps(self.parse_findoutmore(chunk_lines, positions, ids.get, stats)))
+            for (chunk_hash, count, chunk_lines) in new] + [(chunk_hash, -count, None) for (chunk_hash, count) in gone])
+        self.db.save_synced_generation()
+        self.db.db_save()
+        return stats.finish()
+
+    def sync(self):
+        """Pull the changes of the text files, then push if the files still differ from the database.
+
+        Return the SyncStats of the pull and of the push, or None if there was nothing to push.
+        """
+        pulled = self.pull()
+        if self.db.query_generation() != self.db.query_synced_generation():
+            return (pulled, self.push())
+        return (pulled, None)
@@ -0,0 +1,258 @@
+"""Benchmarks of yoes on synthetic books of any size.
+
+A synthetic book is written in the headwords.txt/findoutmore.txt formats:
+headwords in alphabetical order, a SubClass forest of a given depth, and
+Depends/Undefined/RDepends edges with a chosen out-degree distribution, of
+which a given share points "forward" and so closes a cycle. The book is then
+imported and queried, and every measurement is appended to the output file
+as one JSON line, so runs of different versions can be compared with --compare.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import yoes
+import yoes_xmind
+import yoes_sequence_check
+
+SYLLABLES = ['ba', 'ce', 'di', 'fo', 'gu', 'ha', 'ke', 'li', 'mo', 'nu', 'pa', 're', 'si', 'to', 'vu',
+    'xa', 'ze', 'al', 'en', 'ir', 'on', 'us', 'tron', 'gen', 'lux', 'mat', 'phy', 'chem', 'bio', 'geo']
+EDGE_TYPES = [(0, 0.3), (1, 0.6), (3, 0.1)]    # (type id, share) of the non-SubClass edges
+SUBCLASS_TYPE_ID = 2
+
+class SyntheticBook():
+    """Random book with n headwords, reproducible from its seed."""
+    def __init__(self, headwords=1000, degree=4.0, distribution='zipf', alpha=2.0,
+            depth=3, cycle_rate=0.01, seed=1):
+        self.n = headwords
+        self.degree = degree
+        self.distribution = distribution
+        self.alpha = alpha
+        self.depth = depth
+        self.cycle_rate = cycle_rate
+        self.random = random.Random(seed)
+        self.params = dict(headwords=headwords, degree=degree, distribution=distribution, alpha=alpha,
+            depth=depth, cycle_rate=cycle_rate, seed=seed)
+        self.edges = 0
+
+    def make_headwords(self):
+        """Return n distinct, sorted headwords matching the headwords.txt line pattern."""
+        headwords = set()
+        while len(headwords) < self.n:
+            words = [''.join(self.random.choice(SYLLABLES) for i in range(self.random.randint(1, 4)))
+                for j in range(self.random.randint(1, 3))]
+            headword = ' '.join(word.capitalize() for word in words)
+            if headword in headwords:
+                headword = '%s %s' % (headword, len(headwords))
+            headwords.add(headword)
+        return sorted(headwords)
+
+    def out_degree(self):
+        if self.distribution == 'zipf':
+            # Pareto with minimum 1 has mean alpha / (alpha - 1); scale it to the wanted mean
+            scale = self.degree * (self.alpha - 1) / self.alpha
+            return int(scale * self.random.paretovariate(self.alpha))
+        return self.random.randint(0, int(2 * self.degree))
+
+    def edge_type(self):
+        x = self.random.random()
+        for (type_id, share) in EDGE_TYPES:
+            if x < share:
+                return type_id
+            x -= share
+        return EDGE_TYPES[-1][0]
+
+    def write(self, headwords_filename, findoutmore_filename):
+        """Write both text files; return {headword id: level} of the SubClass forest."""
+        headwords = self.make_headwords()
+        with open(headwords_filename, 'w') as f:
+            initial = None
+            for headword in headwords:
+                if initial is not None and headword[0] != initial:
+                    f.write('\n')
+                initial = headword[0]
+                f.write(headword + '\n')
+
+        # ranks: a random order every edge should respect, level by level for the forest
+        order = list(range(self.n))
+        self.random.shuffle(order)
+        roots = max(1, int(round(self.n ** (1.0 / (self.depth + 1)))))
+        bounds = [min(self.n, roots ** (k + 1)) for k in range(self.depth + 1)]
+        bounds[-1] = self.n
+        levels = dict()
+        self.edges = 0
+        with open(findoutmore_filename, 'w') as f:
+            for (rank, headword_id) in enumerate(order):
+                targets = set()
+                depth = next(k for k in range(len(bounds)) if rank < bounds[k])
+                levels[headword_id + 1] = depth if depth <= 2 else -1
+                if depth > 0:
+                    low = bounds[depth - 2] if depth > 1 else 0
+                    parent_id = order[self.random.randrange(low, bounds[depth - 1])]
+                    targets.add(parent_id)
+                    f.write('%d -> %d : %d\n' % (headword_id, parent_id, SUBCLASS_TYPE_ID))
+                for i in range(min(self.out_degree(), self.n - 1)):
+                    if rank + 1 < self.n and (rank == 0 or self.random.random() < self.cycle_rate):
+                        to_id = order[self.random.randrange(rank + 1, self.n)]
+                    else:
+                        to_id = order[self.random.randrange(rank)]
+                    if to_id in targets:
+                        continue
+                    targets.add(to_id)
+                    f.write('%d -> %d : %d\n' % (headword_id, to_id, self.edge_type()))
+                self.edges += len(targets)
+        return levels
+
+class BenchmarkRun():
+    """Time the steps on one book and collect one record per measurement."""
+    def __init__(self, book, workdir, queries=200):
+        self.book = book
+        self.workdir = workdir
+        self.queries = queries
+        self.records = list()
+        self.random = random.Random(book.params['seed'])
+
+    def path(self, filename):
+        return os.path.join(self.workdir, filename)
+
+    def measure(self, benchmark, function, count=1, *args):
+        started = time.time()
+        result = function(*args)
+        seconds = time.time() - started
+        self.records.append(dict(benchmark=benchmark, headwords=self.book.n, edges=self.book.edges,
+            seconds=seconds, count=count, per_op_ms=seconds * 1000 / max(1, count)))
+        sys.stdout.write('%-40s %10d %12.3f s %12.4f ms/op\n' % (benchmark, self.book.n, seconds,
+            seconds * 1000 / max(1, count)))
+        return result
+
+    def run_queries(self, function, keys):
+        return sum(len(function(key)) for key in keys)
+
+    def walk_hierarchy(self, db):
+        hierarchy = yoes.HeadwordHierarchy()
+        hierarchy.load(db)
+        return sum(1 for node in hierarchy.walk())
+
+    def export_xmind(self):
+        connection = sqlite3.connect(self.path('bench.db'))
+        exporter = yoes_xmind.XmindExporter(connection)
+        exporter.load()
+        exporter.save(self.path('bench.xmind'), depends=True)
+        connection.close()
+
+    def check_sequence(self):
+        connection = sqlite3.connect(self.path('bench.db'))
+        validator = yoes_sequence_check.SequenceValidator(yoes_sequence_check.sequence_order(connection))
+        violations = sum(1 for violation in validator.check(yoes_sequence_check.query_sequence_edges(connection)))
+        connection.close()
+        return violations
+
+    def run(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path('bench.db' + suffix)):
+                os.remove(self.path('bench.db' + suffix))
+        levels = self.measure('generate', self.book.write, self.book.n,
+            self.path('headwords.txt'), self.path('findoutmore.txt'))
+
+        db = yoes.DbStorage()
+        db.db_open(self.path('bench.db'))
+        txtfile = yoes.TxtfileStorage(db)
+        self.measure('import_headwords', txtfile.process_headwords_txtfile, self.book.n, self.path('headwords.txt'))
+        self.measure('import_findoutmore', txtfile.process_findoutmore_txtfile, self.book.edges, self.path('findoutmore.txt'))
+        db.write_many('''UPDATE HEADWORDS SET LEVEL = ? WHERE ID = ?;''',
+            [(level, headword_id) for (headword_id, level) in levels.items()])
+        db.db_save()
+
+        headwords = [row[1] for row in db.query_all_headwords()]
+        samples = [self.random.choice(headwords) for i in range(self.queries)]
+        keys = list()
+        for headword in samples:
+            size = self.random.randint(1, min(4, len(headword)))
+            start = self.random.randrange(len(headword) - size + 1)
+            keys.append(headword[start:start + size])
+
+        self.measure('query_headwords_bykey[sql]', self.run_queries, len(keys), db.query_headwords_bykey, keys)
+        self.measure('query_from_headwords[sql]', self.run_queries, len(samples), db.query_from_headwords, samples)
+        self.measure('load_search_index', db.load_search_index)
+        self.measure('query_headwords_bykey[index]', self.run_queries, len(keys), db.query_headwords_bykey, keys)
+        self.measure('load_graph', db.load_graph)
+        self.measure('query_from_headwords[graph]', self.run_queries, len(samples), db.query_from_headwords, samples)
+        self.measure('hierarchy_walk', self.walk_hierarchy, self.book.n, db)
+        self.measure('update_sequence', yoes.update_sequence, self.book.n, db)
+        db.db_close()
+
+        self.measure('xmind_export', self.export_xmind, self.book.n)
+        self.measure('sequence_check', self.check_sequence, self.book.edges)
+        return self.records
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__))).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(records, filename):
+    """Print the ratio of every measurement to the latest one of the same name and size in filename."""
+    baseline = dict()
+    with open(filename) as f:
+        for line in f:
+            record = json.loads(line)
+            if 'benchmark' in record:
+                baseline[(record['benchmark'], record['headwords'])] = record
+    for record in records:
+        old = baseline.get((record['benchmark'], record['headwords']))
+        if old is not None and old['seconds'] > 0:
+            sys.stdout.write('%-40s %10d %8.2fx\n' % (record['benchmark'], record['headwords'],
+                record['seconds'] / old['seconds']))
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark yoes on synthetic books.')
+    parser.add_argument('--headwords', type=int, nargs='+', default=[1000, 10000], help='book sizes to run')
+    parser.add_argument('--degree', type=float, default=4.0, help='mean out-degree of the non-SubClass edges')
+    parser.add_argument('--distribution', choices=['zipf', 'uniform'], default='zipf', help='out-degree distribution')
+    parser.add_argument('--alpha', type=float, default=2.0, help='Pareto exponent of the zipf distribution')
+    parser.add_argument('--depth', type=int, default=3, help='depth of the SubClass forest')
+    parser.add_argument('--cycle-rate', type=float, default=0.01, help='share of edges that may close a cycle')
+    parser.add_argument('--seed', type=int, default=1, help='random seed of the generator')
+    parser.add_argument('--queries', type=int, default=200, help='queries per query benchmark')
+    parser.add_argument('--workdir', help='keep the generated files here instead of a temporary directory')
+    parser.add_argument('--output', default='bench_output.txt', help='append the JSON lines here')
+    parser.add_argument('--compare', metavar='FILE', help='earlier output to compare the timings with')
+    args = parser.parse_args(argv)
+
+    run_info = dict(run=time.strftime('%Y-%m-%dT%H:%M:%S'), revision=git_revision(),
+        python=platform.python_version(), sqlite=sqlite3.sqlite_version)
+    records = list()
+    for headwords in args.headwords:
+        book = SyntheticBook(headwords, args.degree, args.distribution, args.alpha, args.depth,
+            args.cycle_rate, args.seed)
+        workdir = args.workdir or tempfile.mkdtemp(prefix='yoes_bench_')
+        if not os.path.isdir(workdir):
+            os.makedirs(workdir)
+        try:
+            for record in BenchmarkRun(book, workdir, args.queries).run():
+                record.update(run_info)
+                record.update(book.params)
+                records.append(record)
+        finally:
+            if args.workdir is None:
+                shutil.rmtree(workdir)
+
+    if args.compare is not None:
+        compare(records, args.compare)
+    with open(args.output, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record, sort_keys=True) + '\n')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
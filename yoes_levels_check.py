@@ -0,0 +1,78 @@
+"""Check that auto-levelling from the editor survives closing it.
+
+Runs the writes of the editor's Levels > Apply, undo and redo on a copy of
+the database, with the write journal attached as in the editor, and closes
+and reopens the copy after each one as the editor's on_destroy does. The
+levels read back must be the SubClass depths after Apply and redo, and the
+original levels after undo. Prints one JSON line per step.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+from yoes.storage import DbStorage, WriteJournal, plan_levels
+
+def read_levels(dbname):
+    db = DbStorage()
+    db.db_open(dbname)
+    levels = dict((headword, level) for (headword_id, headword, level) in db.query_all_headwords())
+    db.db_close()
+    return levels
+
+def run_step(dbname, step, journal_state):
+    """Do one editor step with the journal attached, then close the storage as on_destroy does."""
+    db = DbStorage()
+    db.db_open(dbname)
+    journal = WriteJournal(db)
+    (journal.undo_stack, journal.redo_stack) = journal_state
+    if step == 'apply':
+        (changes, orphans, conflicts) = plan_levels(db)
+        rows = tuple((headword, new_level) for (headword, old_level, new_level) in changes)
+        with journal.edit():
+            db.update_levels(rows)
+    elif step == 'undo':
+        journal.undo()
+    else:
+        journal.redo()
+    db.db_save()
+    journal_state = (journal.undo_stack, journal.redo_stack)
+    journal.close()
+    db.db_close()
+    return journal_state
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Check that auto-levelling from the editor survives closing it.')
+    parser.add_argument('--db', default='yoes.db', help='sqlite database file, left unchanged')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        dbname = os.path.join(workdir, 'levels.db')
+        shutil.copy(args.db, dbname)
+        original = read_levels(dbname)
+        db = DbStorage()
+        db.db_open(dbname)
+        (changes, orphans, conflicts) = plan_levels(db)
+        db.db_close()
+        levelled = dict(original)
+        levelled.update((headword, new_level) for (headword, old_level, new_level) in changes)
+
+        failures = 0
+        journal_state = ([], [])
+        for (step, expected) in (('apply', levelled), ('undo', original), ('redo', levelled)):
+            journal_state = run_step(dbname, step, journal_state)
+            levels = read_levels(dbname)
+            wrong = sorted(headword for headword in expected if levels.get(headword) != expected[headword])
+            failures += len(wrong)
+            print(json.dumps(dict(step=step, changes=len(changes), wrong=len(wrong), headwords=wrong[:10]),
+                sort_keys=True))
+    finally:
+        shutil.rmtree(workdir)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,140 @@
+"""Check a learning sequence of the HEADWORDS against the FINDOUTMORE edges.
+
+A sequence is any ordering of headwords: the XMind tree written by
+yoes_xmind.py, the SEQUENCE table written by `python -m yoes sequence`, or a plain
+text file with one headword per line. Every Depends/SubClass/RDepends edge
+FROM -> TO requires TO to come before FROM; each edge that does not is
+reported as one JSON line.
+"""
+
+import io
+import sys
+import json
+import sqlite3
+import argparse
+from collections import deque
+
+from yoes.snapshot import GraphSnapshot
+
+SEQUENCE_TYPE_IDS = (1, 2, 3)
+
+def xmind_order(filename):
+    """Return the topic titles of an XMind workbook in preorder."""
+    import xmind
+    workbook = xmind.load(filename)
+    root_topic = workbook.getPrimarySheet().getRootTopic()
+    topics = deque()
+    topics.append(root_topic)
+    headwords = list()
+    while len(topics) > 0:
+        topic = topics.pop()
+        headwords.append(topic.getTitle())
+        sub_topics = topic.getSubTopics()
+        if sub_topics == None:
+            continue
+        sub_topics.reverse()
+        for t in sub_topics:
+            topics.append(t)
+    return headwords
+
+def txtfile_order(filename):
+    """Return the non-blank lines of a text file, one headword per line."""
+    with io.open(filename, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() != '']
+
+def sequence_order(db):
+    """Return the headwords of the SEQUENCE table in rank order."""
+    cursor = db.execute('''SELECT HEADWORDS.HEADWORD FROM SEQUENCE, HEADWORDS
+        WHERE HEADWORDS.ROWID = SEQUENCE.HEADWORD_ID ORDER BY SEQUENCE.RANK ASC;''')
+    return [row[0] for row in cursor]
+
+def snapshot_sequence_edges(snapshot):
+    """Yield (from headword, to headword, type id) of the sequence edges of a GraphSnapshot."""
+    for (from_i, to_i, type_id) in snapshot.edges(SEQUENCE_TYPE_IDS):
+        yield (snapshot.headword(from_i), snapshot.headword(to_i), type_id)
+
+def query_sequence_edges(db):
+    """Yield (from headword, to headword, type id) of the sequence edges without fetching them all."""
+    cursor = db.execute('''SELECT H1.HEADWORD, H2.HEADWORD, FINDOUTMORE.TYPE_ID
+        FROM FINDOUTMORE, HEADWORDS H1, HEADWORDS H2
+        WHERE H1.ROWID = FINDOUTMORE.FROM_ID AND H2.ROWID = FINDOUTMORE.TO_ID
+        AND FINDOUTMORE.TYPE_ID IN (%s);''' % ', '.join(str(type_id) for type_id in SEQUENCE_TYPE_IDS))
+    for row in cursor:
+        yield row
+
+class SequenceValidator():
+    """Validate edges against one ordering, keeping counts per violation and edge type."""
+    def __init__(self, headwords):
+        self.positions = dict()
+        for (position, headword) in enumerate(headwords):
+            self.positions.setdefault(headword, position)
+        self.missing = set()
+        self.edges = 0
+        self.counts = dict()        # violation -> count
+        self.type_counts = dict()   # edge type id -> count of wrong_sequence
+
+    def count(self, violation, type_id=None):
+        self.counts[violation] = self.counts.get(violation, 0) + 1
+        if type_id is not None:
+            self.type_counts[type_id] = self.type_counts.get(type_id, 0) + 1
+
+    def check(self, edges):
+        """Yield a violation record for every bad (from, to, type id) edge."""
+        for (from_headword, to_headword, type_id) in edges:
+            self.edges += 1
+            from_i = self.positions.get(from_headword)
+            to_i = self.positions.get(to_headword)
+            if from_i is None or to_i is None:
+                for headword in (from_headword, to_headword):
+                    if headword not in self.positions and headword not in self.missing:
+                        self.missing.add(headword)
+                        self.count('missing')
+                        yield dict(violation='missing', headword=headword)
+                continue
+            if from_i <= to_i:
+                self.count('wrong_sequence', type_id)
+                yield dict(violation='wrong_sequence', type_id=type_id,
+                    from_headword=from_headword, from_position=from_i,
+                    to_headword=to_headword, to_position=to_i)
+
+    def summary(self):
+        return dict(headwords=len(self.positions), edges=self.edges, violations=self.counts,
+            wrong_sequence_by_type=dict((str(k), v) for (k, v) in self.type_counts.items()))
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Check a learning sequence against the FINDOUTMORE edges.')
+    parser.add_argument('--db', default='yoes.db', help='sqlite database file')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--xmind', metavar='FILE', help='order of the topics of an XMind workbook')
+    source.add_argument('--sequence', action='store_true', help='order of the SEQUENCE table')
+    source.add_argument('--txtfile', metavar='FILE', help='order of a text file with one headword per line')
+    parser.add_argument('--output', metavar='FILE', help='write the JSON lines here instead of stdout')
+    parser.add_argument('--snapshot', metavar='FILE', help='read the edges from this graph snapshot, rewritten when stale')
+    args = parser.parse_args(argv)
+
+    db = sqlite3.connect(args.db)
+    db.execute('PRAGMA query_only = 1;')
+    if args.xmind is not None:
+        headwords = xmind_order(args.xmind)
+    elif args.txtfile is not None:
+        headwords = txtfile_order(args.txtfile)
+    else:
+        headwords = sequence_order(db)
+
+    validator = SequenceValidator(headwords)
+    output = sys.stdout if args.output is None else open(args.output, 'w')
+    if args.snapshot is not None:
+        edges = snapshot_sequence_edges(GraphSnapshot.open(db, args.snapshot))
+    else:
+        edges = query_sequence_edges(db)
+    for violation in validator.check(edges):
+        output.write(json.dumps(violation, sort_keys=True) + '\n')
+    db.close()
+    summary = validator.summary()
+    output.write(json.dumps(dict(summary=summary), sort_keys=True) + '\n')
+    if output is not sys.stdout:
+        output.close()
+    return 1 if summary['violations'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
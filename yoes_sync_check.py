@@ -0,0 +1,61 @@
+"""Check that syncing an existing database with its text files keeps its edges.
+
+Copies the database and the text files, then syncs the copies twice, as
+`python -m yoes sync` does. The first sync has no chunks recorded yet and
+must leave the headwords and the findoutmore types set in the editor as
+they are; the second must find nothing to change. Prints one JSON line per
+sync.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+from yoes.storage import DbStorage
+from yoes.sync import TxtfileSync
+
+def read_counts(db):
+    """Return the number of headwords and the number of findoutmore rows by type."""
+    types = {}
+    for (from_id, to_id, type_id) in db.query_all_findoutmore():
+        types[type_id] = types.get(type_id, 0) + 1
+    return (len(db.query_all_headwords()), types)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Check that syncing an existing database keeps its edges.')
+    parser.add_argument('--db', default='yoes.db', help='sqlite database file, left unchanged')
+    parser.add_argument('--headwords', default='headwords.txt', help='headwords text file, left unchanged')
+    parser.add_argument('--findoutmore', default='findoutmore.txt', help='findoutmore text file, left unchanged')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        dbname = os.path.join(workdir, 'sync.db')
+        headwords_filename = os.path.join(workdir, 'headwords.txt')
+        findoutmore_filename = os.path.join(workdir, 'findoutmore.txt')
+        shutil.copy(args.db, dbname)
+        shutil.copy(args.headwords, headwords_filename)
+        shutil.copy(args.findoutmore, findoutmore_filename)
+
+        db = DbStorage()
+        db.db_open(dbname)
+        expected = read_counts(db)
+        syncer = TxtfileSync(db, headwords_filename, findoutmore_filename)
+        failures = 0
+        for step in ('first', 'second'):
+            (pulled, pushed) = syncer.sync()
+            counts = read_counts(db)
+            changed = step == 'second' and pushed is not None
+            failures += counts != expected or changed
+            print(json.dumps(dict(step=step, headwords=counts[0], expected_headwords=expected[0],
+                types=counts[1], expected_types=expected[1], pushed=pushed is not None), sort_keys=True))
+        db.db_close()
+    finally:
+        shutil.rmtree(workdir)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,78 +1,177 @@
-import xmind
-from xmind.core import workbook,saver
-from xmind.core.topic import TopicElement
-import sqlite3
-import os
+"""Export the HEADWORDS hierarchy of yoes.db to an XMind workbook.
+
+Headwords go under their SubClass parent, level 0 headwords under the root
+topic and all others under "Undefined"; Depends edges can be added as
+relationships. content.xml is streamed into the workbook while walking the
+SubClass forest, so memory and time grow linearly with the headwords and edges.
+"""
 
-def query_headwords():
-    cursor = db.execute('''SELECT * FROM HEADWORDS ORDER BY HEADWORD ASC;''')
-    rows = cursor.fetchall()
-    return rows
-
-def query_findoutmore():
-    cursor = db.execute('''SELECT * FROM V_FINDOUTMORE;''')
-    rows = cursor.fetchall()
-    return rows
-
-db = sqlite3.connect("yoes.db")
-db.execute("""CREATE VIEW IF NOT EXISTS V_FINDOUTMORE
-    AS SELECT H1.HEADWORD FROM_HEADWORD, H2.HEADWORD TO_HEADWORD, FINDOUTMORE.TYPE_ID FROM HEADWORDS H1, FINDOUTMORE, HEADWORDS H2
-    WHERE H1.ROWID = FINDOUTMORE.FROM_ID AND H2.ROWID = FINDOUTMORE.TO_ID;""")
-
-headwords_rows = query_headwords()
-findoutmore_rows = query_findoutmore()
-db.close()
-
-####################################################################################
-xmind_filename = '.\\yoes.xmind'
-
-if os.path.exists(xmind_filename):
-    os.remove(xmind_filename)
-workbook = xmind.load(xmind_filename) # load an existing file or create a new workbook if nothing is found
-
-sheet = workbook.getPrimarySheet() # get the first sheet
-sheet.setTitle("YOES") # set its title
-
-root_topic = sheet.getRootTopic() # get the root topic of this sheet
-root_topic.setTitle("YOES") # set its title
-
-undefined_topic = TopicElement()
-undefined_topic.setTitle("Undefined")
-root_topic.addSubTopic(undefined_topic)
-
-headwords = list()
-topics = list()
-
-for row in headwords_rows:
-    headword = row[0]
-    level = row[1]
-    headwords.append(headword)
-
-    topic = TopicElement(None, workbook)
-    topic.setTitle(headword)
-    topics.append(topic)
-
-    if level == 0:
-        root_topic.addSubTopic(topic)
-    else:
-        undefined_topic.addSubTopic(topic)
-
-for row in findoutmore_rows:
-    from_headword = row[0]
-    to_headword = row[1]
-    type_id = row[2]
-    from_i = headwords.index(from_headword)
-    to_i = headwords.index(to_headword)
-    from_topic = topics[from_i]
-    to_topic = topics[to_i]
-
-    if type_id == 2:
-        to_topic.addSubTopic(from_topic)
-    elif type_id == 1:
-        pass
-        #rel = sheet.createRelationship(from_topic.getID(), to_topic.getID())
-        #sheet.addRelationship(rel)
-    elif type_id == 0:
-        pass
-
-xmind.save(workbook)
+import io
+import os
+import sys
+import time
+import sqlite3
+import zipfile
+import argparse
+import tempfile
+from xml.sax.saxutils import escape, quoteattr
+
+SUBCLASS_TYPE_ID = 2
+DEPENDS_TYPE_ID = 1
+
+CONTENT_XML_HEAD = (u'<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+    u'<xmap-content xmlns="urn:xmind:xmap:xmlns:content:2.0" xmlns:fo="http://www.w3.org/1999/XSL/Format" '
+    u'xmlns:svg="http://www.w3.org/2000/svg" xmlns:xhtml="http://www.w3.org/1999/xhtml" '
+    u'xmlns:xlink="http://www.w3.org/1999/xlink" timestamp="%(timestamp)s" version="2.0">'
+    u'<sheet id="yoes-sheet" timestamp="%(timestamp)s">')
+MANIFEST_XML = (u'<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+    u'<manifest xmlns="urn:xmind:xmap:xmlns:manifest:1.0">'
+    u'<file-entry full-path="content.xml" media-type="text/xml"/>'
+    u'<file-entry full-path="META-INF/" media-type=""/>'
+    u'<file-entry full-path="META-INF/manifest.xml" media-type="text/xml"/>'
+    u'<file-entry full-path="meta.xml" media-type="text/xml"/>'
+    u'</manifest>')
+META_XML = (u'<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+    u'<meta xmlns="urn:xmind:xmap:xmlns:meta:2.0" version="2.0"/>')
+
+class XmindExporter():
+    """Walk the SubClass forest once with id-keyed maps and stream it out as XMind topics."""
+    def __init__(self, db):
+        self.db = db
+        self.timestamp = int(time.time() * 1000)
+        self.headwords = dict()     # id -> headword
+        self.children = dict()      # parent id -> sub ids, sorted by headword
+        self.root_ids = list()      # level 0 headwords without a SubClass parent
+        self.undefined_ids = list() # every other headword without a SubClass parent
+
+    def load(self):
+        parents = dict()
+        for (sub_id, headword_id) in self.db.execute('''SELECT FROM_ID, TO_ID FROM FINDOUTMORE
+                WHERE TYPE_ID = ?;''', [SUBCLASS_TYPE_ID]):
+            parents[sub_id] = headword_id
+        levels = list()
+        for (headword_id, headword, level) in self.db.execute('''SELECT ROWID, HEADWORD, LEVEL FROM HEADWORDS
+                ORDER BY HEADWORD ASC;'''):
+            self.headwords[headword_id] = headword
+            levels.append((headword_id, level))
+        for (headword_id, level) in levels:
+            parent_id = parents.get(headword_id)
+            if parent_id in self.headwords and parent_id != headword_id:
+                self.children.setdefault(parent_id, list()).append(headword_id)
+            elif level == 0:
+                self.root_ids.append(headword_id)
+            else:
+                self.undefined_ids.append(headword_id)
+        self.attach_cycles()
+
+    def attach_cycles(self):
+        """Move headwords only reachable through a SubClass cycle under "Undefined"."""
+        reached = set()
+        for headword_id in self.root_ids + self.undefined_ids:
+            self.reach(headword_id, reached)
+        for headword_id in self.headwords:
+            if headword_id not in reached:
+                self.undefined_ids.append(headword_id)
+                self.reach(headword_id, reached)
+
+    def reach(self, headword_id, reached):
+        stack = [headword_id]
+        while stack:
+            headword_id = stack.pop()
+            if headword_id not in reached:
+                reached.add(headword_id)
+                stack.extend(self.children.get(headword_id, ()))
+
+    def topic_xml(self, topic_id, title):
+        return u'<topic id=%s timestamp="%s"><title>%s</title>' % (quoteattr(topic_id), self.timestamp, escape(title))
+
+    def write_topics(self, out, headword_ids, written):
+        """Write headword_ids and their SubClass subtrees in preorder."""
+        stack = [iter(headword_ids)]
+        while stack:
+            headword_id = next(stack[-1], None)
+            if headword_id is None:
+                stack.pop()
+                if stack:
+                    out.write(u'</topics></children></topic>')
+                continue
+            if headword_id in written:
+                continue
+            written.add(headword_id)
+            out.write(self.topic_xml('yoes-%d' % headword_id, self.headwords[headword_id]))
+            if headword_id in self.children:
+                out.write(u'<children><topics type="attached">')
+                stack.append(iter(self.children[headword_id]))
+            else:
+                out.write(u'</topic>')
+
+    def write_relationships(self, out):
+        """Write the Depends edges as relationships, streamed from the database."""
+        out.write(u'<relationships>')
+        for (from_id, to_id) in self.db.execute('''SELECT FROM_ID, TO_ID FROM FINDOUTMORE
+                WHERE TYPE_ID = ?;''', [DEPENDS_TYPE_ID]):
+            if from_id in self.headwords and to_id in self.headwords:
+                out.write(u'<relationship end1="yoes-%d" end2="yoes-%d" id="yoes-%d-%d" timestamp="%s"/>'
+                    % (from_id, to_id, from_id, to_id, self.timestamp))
+        out.write(u'</relationships>')
+
+    def write_content(self, out, depends=False):
+        written = set()
+        out.write(CONTENT_XML_HEAD % dict(timestamp=self.timestamp))
+        out.write(self.topic_xml('yoes-root', u'YOES'))
+        out.write(u'<children><topics type="attached">')
+        out.write(self.topic_xml('yoes-undefined', u'Undefined'))
+        if self.undefined_ids:
+            out.write(u'<children><topics type="attached">')
+            self.write_topics(out, self.undefined_ids, written)
+            out.write(u'</topics></children>')
+        out.write(u'</topic>')
+        self.write_topics(out, self.root_ids, written)
+        out.write(u'</topics></children></topic>')
+        out.write(u'<title>YOES</title>')
+        if depends:
+            self.write_relationships(out)
+        out.write(u'</sheet></xmap-content>')
+
+    def save(self, xmind_filename, depends=False):
+        """Write the workbook; content.xml is streamed into the archive, not built in memory.
+
+        ZipFile.open() only writes from Python 3.6 on; before that content.xml
+        goes through a temporary file.
+        """
+        with zipfile.ZipFile(xmind_filename, 'w', zipfile.ZIP_DEFLATED) as xmind_file:
+            if sys.version_info >= (3, 6):
+                with io.TextIOWrapper(xmind_file.open('content.xml', 'w'), encoding='utf-8') as out:
+                    self.write_content(out, depends)
+            else:
+                self.write_content_file(xmind_file, xmind_filename, depends)
+            xmind_file.writestr('META-INF/manifest.xml', MANIFEST_XML.encode('utf-8'))
+            xmind_file.writestr('meta.xml', META_XML.encode('utf-8'))
+
+    def write_content_file(self, xmind_file, xmind_filename, depends):
+        """Add content.xml to the archive through a temporary file beside it."""
+        (fd, content_filename) = tempfile.mkstemp(suffix='.xml', dir=os.path.dirname(os.path.abspath(xmind_filename)))
+        os.close(fd)
+        try:
+            with io.open(content_filename, 'w', encoding='utf-8') as out:
+                self.write_content(out, depends)
+            xmind_file.write(content_filename, 'content.xml')
+        finally:
+            os.remove(content_filename)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Export the headword hierarchy to an XMind workbook.')
+    parser.add_argument('--db', default='yoes.db', help='sqlite database file')
+    parser.add_argument('--output', default='yoes.xmind', help='XMind file to write')
+    parser.add_argument('--depends', action='store_true', help='add Depends edges as relationships')
+    args = parser.parse_args(argv)
+
+    db = sqlite3.connect(args.db)
+    db.execute('PRAGMA query_only = 1;')
+    exporter = XmindExporter(db)
+    exporter.load()
+    exporter.save(args.output, args.depends)
+    db.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])